@@ -14,6 +14,22 @@ _ALWAYS_SAVE = {"discord_token", "db_password"}
 class Config:
     no_db_mode: bool = False
     db_password: str = "DATABASE_PASSWORD"
+    db_host: str = "localhost"
+    db_port: int = 5432
+    # directory of the postgres unix socket. Used instead of host and port.
+    db_socket: str | None = None
+    db_pool_min_size: int = 2
+    db_pool_max_size: int = 10
+    # prepared statements cached per connection
+    db_statement_cache_size: int = 256
+    # idle pool connections are closed after this long
+    db_max_inactive_connection_lifetime: timedelta = timedelta(minutes=5)
+    db_command_timeout: timedelta = timedelta(seconds=30)
+    # queries slower than this are logged
+    db_slow_query_threshold: timedelta = timedelta(milliseconds=100)
+    # where the schema fingerprint of the last successful migration check is
+    # kept. Delete it to force the check on the next start.
+    db_schema_fingerprint_path: str = "schema_fingerprint"
 
     discord_token: str = "DISCORD_TOKEN"
     theme: int = 0x0B7CD3
@@ -30,8 +46,25 @@ class Config:
     highlight_trigger_cooldown: tuple[int, timedelta] = (1, timedelta(seconds=30))
     pep_cooldown: tuple[int, timedelta] = (1, timedelta(minutes=5))
 
+    highlight_dm_channel_cache_size: int = 10_000
+    # how long to stop DMing users whose DMs are closed
+    highlight_closed_dm_ttl: timedelta = timedelta(hours=1)
+    highlight_dm_workers: int = 4
+    # maximum number of users waiting for a highlight DM
+    highlight_dm_queue_size: int = 1_000
+    # triggers for the same user within this window are sent as one DM
+    highlight_dm_coalesce_window: timedelta = timedelta(seconds=10)
+
+    # where the last fetched PEP data is kept between restarts
+    pep_snapshot_path: str = "pep_snapshot.json"
+
     mcoding_yt_id: str = "YOUTUBE_CHANNEL_ID"
     yt_api_key: str = "YOUTUBE_API_KEY"
+    # how long fetched YouTube statistics are served to /stats before
+    # refetching. Shorter than the 5 minute stats loop, so every loop
+    # iteration refreshes them, while /stats in between is served from cache.
+    yt_stats_ttl: timedelta = timedelta(minutes=4)
+    yt_daily_quota: int = 10_000
 
     mcoding_website: str = "https://mcoding.io"
     mcoding_youtube: str = "https://www.youtube.com/@mCoding"
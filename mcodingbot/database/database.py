@@ -1,35 +1,318 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
-from typing import TypeVar
+import time
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Mapping, Sequence, TypeVar
 
 import apgorm
+from apgorm.connection import Connection
+from apgorm.utils.lazy_list import LazyList
+from asyncpg import Record
+from asyncpg.cursor import CursorFactory
 
 from mcodingbot.config import CONFIG
-from mcodingbot.database.models import Highlight, User, UserHighlight
+from mcodingbot.database.instrumentation import QueryStats, QueryTiming
+from mcodingbot.database.models import Highlight, StatsSample, User, UserHighlight
 
 _LOGGER = logging.getLogger(__name__)
 _SELF = TypeVar("_SELF", bound="Database")
 
+_HIGHLIGHT_SUBSCRIPTIONS = (
+    "SELECT highlights.highlight, user_highlights.user_id FROM highlights"
+    " JOIN user_highlights ON user_highlights.highlight_id = highlights.id"
+)
+# the highlight (and the user) are created if they do not exist yet, and
+# nothing is written if the user already has `$3` highlights.
+_ADD_USER_HIGHLIGHT = """
+WITH quota AS (
+    SELECT count(*) < $3 AS allowed FROM user_highlights
+    WHERE user_id = $1::bigint
+), new_user AS (
+    INSERT INTO users (user_id, is_donor)
+    SELECT $1::bigint, false FROM quota WHERE allowed
+    ON CONFLICT (user_id) DO NOTHING
+), highlight_row AS (
+    -- DO UPDATE instead of DO NOTHING, so the id is returned even if another
+    -- transaction created the highlight after this statement's snapshot.
+    INSERT INTO highlights (highlight)
+    SELECT $2::varchar FROM quota WHERE allowed
+    ON CONFLICT (highlight) DO UPDATE SET highlight = excluded.highlight
+    RETURNING id
+), added AS (
+    INSERT INTO user_highlights (highlight_id, user_id)
+    SELECT highlight_row.id, $1::bigint FROM highlight_row
+    ON CONFLICT DO NOTHING
+    RETURNING highlight_id
+)
+SELECT quota.allowed, EXISTS (SELECT 1 FROM added) AS added FROM quota
+"""
+_REMOVE_USER_HIGHLIGHT = """
+DELETE FROM user_highlights USING highlights
+WHERE user_highlights.highlight_id = highlights.id
+    AND highlights.highlight = $2
+    AND user_highlights.user_id = $1::bigint
+RETURNING user_highlights.highlight_id
+"""
+
+_SET_DONOR = """
+INSERT INTO users (user_id, is_donor) VALUES ($1::bigint, $2)
+ON CONFLICT (user_id) DO UPDATE SET is_donor = excluded.is_donor
+"""
+_DONOR_IDS = "SELECT user_id FROM users WHERE is_donor"
+_ADD_DONORS = """
+INSERT INTO users (user_id, is_donor)
+SELECT user_id, true FROM unnest($1::bigint[]) AS user_id
+ON CONFLICT (user_id) DO UPDATE SET is_donor = true
+"""
+# samples are written in one statement per batch. A bucket that is written
+# again holds the latest sample in it.
+_UPSERT_STATS_SAMPLES = """
+INSERT INTO stats_samples (resolution, taken_at, subs, views, members)
+SELECT * FROM unnest(
+    $1::integer[], $2::timestamptz[], $3::bigint[], $4::bigint[], $5::bigint[]
+)
+ON CONFLICT (resolution, taken_at) DO UPDATE
+SET subs = excluded.subs, views = excluded.views, members = excluded.members
+"""
+_FETCH_STATS_SAMPLES = """
+SELECT stats_samples.* FROM stats_samples
+JOIN unnest($1::integer[], $2::timestamptz[]) AS tiers (resolution, oldest)
+    ON stats_samples.resolution = tiers.resolution
+    AND stats_samples.taken_at >= tiers.oldest
+ORDER BY stats_samples.resolution, stats_samples.taken_at
+"""
+_PRUNE_STATS_SAMPLES = """
+DELETE FROM stats_samples
+USING unnest($1::integer[], $2::timestamptz[]) AS tiers (resolution, oldest)
+WHERE stats_samples.resolution = tiers.resolution
+    AND stats_samples.taken_at < tiers.oldest
+"""
+
 
 class Database(apgorm.Database):
     users = User
     user_highlights = UserHighlight
     highlights = Highlight
+    stats_samples = StatsSample
 
     def __init__(self) -> None:
         super().__init__("mcodingbot/database/migrations")
+        self.query_stats = QueryStats(CONFIG.db_slow_query_threshold.total_seconds())
 
     async def open(self) -> None:
+        # every hot query is a constant string, so asyncpg prepares it once
+        # per connection and reuses it from the statement cache after that.
         await self.connect(
-            host="localhost",
+            host=CONFIG.db_socket or CONFIG.db_host,
+            port=CONFIG.db_port,
             database="mcodingbot",
             user="mcodingbot",
             password=CONFIG.db_password,
+            min_size=CONFIG.db_pool_min_size,
+            max_size=CONFIG.db_pool_max_size,
+            statement_cache_size=CONFIG.db_statement_cache_size,
+            max_inactive_connection_lifetime=(
+                CONFIG.db_max_inactive_connection_lifetime.total_seconds()
+            ),
+            command_timeout=CONFIG.db_command_timeout.total_seconds(),
         )
+
+        fingerprint_path = Path(CONFIG.db_schema_fingerprint_path)
+        with suppress(FileNotFoundError):
+            if fingerprint_path.read_text() == self._schema_fingerprint():
+                _LOGGER.info("Schema is unchanged, skipping migration checks.")
+                return
+
         if self.must_create_migrations():
             _LOGGER.info("Creating migrations...")
             self.create_migrations()
         if await self.must_apply_migrations():
             _LOGGER.info("Applying migrations...")
             await self.apply_migrations()
+
+        fingerprint_path.write_text(self._schema_fingerprint())
+
+    def _schema_fingerprint(self) -> str:
+        """
+        Hash of the models, the migrations and the database they were applied
+        to. If it matches the one stored after the last successful start,
+        there is nothing to create or apply.
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps(self.describe().dict(), sort_keys=True).encode())
+        for path in sorted(self._migrations_folder.glob("*/migrations.sql")):
+            digest.update(path.parent.name.encode())
+            digest.update(path.read_bytes())
+        digest.update(f"{CONFIG.db_socket or CONFIG.db_host}:{CONFIG.db_port}".encode())
+        return digest.hexdigest()
+
+    # Every query made through the database, including the ones built by the
+    # models, goes through these methods, so they are instrumented here.
+
+    async def execute(self, query: str, params: list[Any]) -> None:
+        async with self._connection(query, params) as (con, _):
+            await con.execute(query, params)
+
+    async def fetchrow(self, query: str, params: list[Any]) -> dict[str, Any] | None:
+        async with self._connection(query, params) as (con, timing):
+            row = await con.fetchrow(query, params)
+            timing.rows = int(row is not None)
+            return row
+
+    async def fetchmany(
+        self, query: str, params: list[Any]
+    ) -> LazyList[Record, dict[str, Any]]:
+        async with self._connection(query, params) as (con, timing):
+            rows = await con.fetchmany(query, params)
+            timing.rows = len(rows)
+            return rows
+
+    async def fetchval(self, query: str, params: list[Any]) -> Any:
+        async with self._connection(query, params) as (con, timing):
+            value = await con.fetchval(query, params)
+            timing.rows = int(value is not None)
+            return value
+
+    @asynccontextmanager
+    async def cursor(
+        self, query: str, params: list[Any], con: Connection | None = None
+    ) -> AsyncIterator[CursorFactory]:
+        """
+        Same as `apgorm.Database.cursor`. Rows are not counted, and the time
+        spent consuming the cursor is included in its latency.
+        """
+        if con:
+            yield con.cursor(query, params)
+        else:
+            async with self._connection(query, params) as (con, _):
+                yield con.cursor(query, params)
+
+    @asynccontextmanager
+    async def _connection(
+        self, query: str, params: list[Any]
+    ) -> AsyncIterator[tuple[Connection, QueryTiming]]:
+        """
+        Acquire a connection and start a transaction, recording how long the
+        query waited for the connection and how long it took in total.
+        """
+        assert self.pool is not None
+        timing = QueryTiming(query, params)
+        try:
+            async with self.pool.acquire() as con:
+                timing.acquired = time.perf_counter()
+                async with con.transaction():
+                    yield con, timing
+        except BaseException:
+            timing.failed = True
+            raise
+        finally:
+            self.query_stats.finish(timing)
+
+    async def iter_highlight_subscriptions(self) -> AsyncIterator[tuple[str, int]]:
+        """
+        Stream every (highlight, user_id) pair through a server-side cursor.
+        """
+        async with self.cursor(_HIGHLIGHT_SUBSCRIPTIONS, []) as cursor:
+            async for row in cursor:
+                yield row["highlight"], row["user_id"]
+
+    async def add_user_highlight(
+        self, user_id: int, highlight: str, max_highlights: int
+    ) -> bool | None:
+        """
+        Add a highlight for a user in a single statement.
+
+        Returns True if it was added, False if the user already had it, and
+        None if the user already has `max_highlights` highlights.
+        """
+        row = await self.fetchrow(
+            _ADD_USER_HIGHLIGHT, [user_id, highlight, max_highlights]
+        )
+        assert row is not None
+        if not row["allowed"]:
+            return None
+        return bool(row["added"])
+
+    async def remove_user_highlight(self, user_id: int, highlight: str) -> bool:
+        """
+        Remove a highlight from a user. Returns False if they did not have it.
+        """
+        return (
+            await self.fetchval(_REMOVE_USER_HIGHLIGHT, [user_id, highlight])
+            is not None
+        )
+
+    async def fetch_donor_ids(self) -> set[int]:
+        return {row["user_id"] for row in await self.fetchmany(_DONOR_IDS, [])}
+
+    async def set_donor(self, user_id: int, is_donor: bool) -> None:
+        """
+        Set whether a user is a donor in one statement, creating the user if
+        they do not exist yet.
+        """
+        await self.execute(_SET_DONOR, [user_id, is_donor])
+
+    async def add_donors(self, user_ids: Sequence[int]) -> None:
+        """
+        Mark users as donors in one statement, creating the ones that do not
+        exist yet.
+        """
+        if user_ids:
+            await self.execute(_ADD_DONORS, [list(user_ids)])
+
+    async def upsert_stats_samples(
+        self, samples: Sequence[tuple[int, int, tuple[int, ...]]]
+    ) -> None:
+        """
+        Write (resolution, bucket, (subs, views, members)) samples in one
+        batch. Buckets are in seconds since the epoch.
+        """
+        if not samples:
+            return
+
+        await self.execute(
+            _UPSERT_STATS_SAMPLES,
+            [
+                [resolution for resolution, _, _ in samples],
+                [_from_timestamp(bucket) for _, bucket, _ in samples],
+                *([values[i] for _, _, values in samples] for i in range(3)),
+            ],
+        )
+
+    async def fetch_stats_samples(
+        self, oldest: Mapping[int, int]
+    ) -> dict[int, list[tuple[int, tuple[int, int, int]]]]:
+        """
+        Return the samples of every resolution in `oldest` that are not older
+        than the bucket given for it, oldest first.
+        """
+        rows = await self.fetchmany(_FETCH_STATS_SAMPLES, _tiers_params(oldest))
+        samples: dict[int, list[tuple[int, tuple[int, int, int]]]] = {}
+        for row in rows:
+            samples.setdefault(row["resolution"], []).append(
+                (
+                    int(row["taken_at"].timestamp()),
+                    (row["subs"], row["views"], row["members"]),
+                )
+            )
+        return samples
+
+    async def prune_stats_samples(self, oldest: Mapping[int, int]) -> None:
+        """
+        Delete the samples of every resolution in `oldest` that are older than
+        the bucket given for it.
+        """
+        await self.execute(_PRUNE_STATS_SAMPLES, _tiers_params(oldest))
+
+
+def _from_timestamp(timestamp: int) -> datetime:
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+def _tiers_params(oldest: Mapping[int, int]) -> list[object]:
+    return [list(oldest), [_from_timestamp(bucket) for bucket in oldest.values()]]
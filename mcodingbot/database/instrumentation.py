@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import bisect
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Sequence
+
+__all__: Sequence[str] = ("QueryStats", "StatementStats", "QueryTiming")
+
+_LOGGER = logging.getLogger(__name__)
+
+# upper bounds of the latency histogram buckets, in milliseconds. The last
+# bucket counts everything slower.
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1_000, 2_500)
+# statements beyond this many are counted together, so queries with
+# generated SQL can not grow the stats without bound.
+MAX_STATEMENTS = 256
+OTHER_STATEMENTS = "<other>"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class StatementStats:
+    calls: int = 0
+    errors: int = 0
+    rows: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+    total_pool_wait: float = 0.0
+    histogram: list[int] = field(
+        default_factory=lambda: [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    )
+
+    @property
+    def mean_latency(self) -> float:
+        return self.total_latency / self.calls if self.calls else 0.0
+
+    @property
+    def mean_pool_wait(self) -> float:
+        return self.total_pool_wait / self.calls if self.calls else 0.0
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Return the upper bound, in milliseconds, of the histogram bucket the
+        percentile falls in. The last bucket is bounded by the slowest call.
+        """
+        if not self.calls:
+            return 0.0
+
+        rank = fraction * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.histogram):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max_latency * 1_000
+
+    def record(self, latency: float, pool_wait: float, rows: int) -> None:
+        self.calls += 1
+        self.rows += rows
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        self.total_pool_wait += pool_wait
+        self.histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, latency * 1_000)] += 1
+
+
+@dataclass
+class QueryTiming:
+    """
+    Timing of one query, from asking the pool for a connection until the
+    transaction finished.
+    """
+
+    query: str
+    params: list[Any]
+    started: float = field(default_factory=time.perf_counter)
+    acquired: float | None = None
+    rows: int = 0
+    failed: bool = False
+
+
+class QueryStats:
+    """
+    Latency histograms, rows returned and pool wait time per statement, plus
+    a log of the statements slower than `slow_threshold` seconds.
+    """
+
+    def __init__(self, slow_threshold: float) -> None:
+        self.slow_threshold = slow_threshold
+        self.statements: dict[str, StatementStats] = {}
+        self.slow_queries = 0
+
+    def finish(self, timing: QueryTiming) -> None:
+        finished = time.perf_counter()
+        acquired = timing.acquired if timing.acquired is not None else finished
+        latency = finished - timing.started
+
+        statement = _WHITESPACE.sub(" ", timing.query).strip()
+        if (stats := self.statements.get(statement)) is None:
+            if len(self.statements) >= MAX_STATEMENTS:
+                statement = OTHER_STATEMENTS
+            stats = self.statements.setdefault(statement, StatementStats())
+
+        stats.record(latency, acquired - timing.started, timing.rows)
+        if timing.failed:
+            stats.errors += 1
+
+        if latency >= self.slow_threshold:
+            self.slow_queries += 1
+            _LOGGER.warning(
+                f"Slow query ({latency * 1_000:.1f}ms, waited"
+                f" {(acquired - timing.started) * 1_000:.1f}ms for a connection):"
+                f" {statement} with params {_redact(timing.params)}"
+            )
+
+    def slowest(self, limit: int) -> list[tuple[str, StatementStats]]:
+        """
+        Return the statements with the highest total latency first.
+        """
+        return sorted(
+            self.statements.items(),
+            key=lambda item: item[1].total_latency,
+            reverse=True,
+        )[:limit]
+
+    def stats(self) -> dict[str, int | float]:
+        calls = sum(stats.calls for stats in self.statements.values())
+        total_latency = sum(stats.total_latency for stats in self.statements.values())
+        pool_wait = sum(stats.total_pool_wait for stats in self.statements.values())
+        return {
+            "statements": len(self.statements),
+            "calls": calls,
+            "errors": sum(stats.errors for stats in self.statements.values()),
+            "rows": sum(stats.rows for stats in self.statements.values()),
+            "mean_latency_ms": round(total_latency / calls * 1_000, 2) if calls else 0,
+            "mean_pool_wait_ms": round(pool_wait / calls * 1_000, 2) if calls else 0,
+            "slow_queries": self.slow_queries,
+        }
+
+
+def _redact(params: list[Any]) -> str:
+    """
+    Describe parameters by type only, so user ids and message content never
+    end up in the logs.
+    """
+    return "[" + ", ".join(f"<{type(param).__name__}>" for param in params) + "]"
@@ -0,0 +1,12 @@
+CREATE TABLE stats_samples ();
+ALTER TABLE stats_samples ADD COLUMN resolution INTEGER;
+ALTER TABLE stats_samples ADD COLUMN taken_at TIMESTAMPTZ;
+ALTER TABLE stats_samples ADD COLUMN subs BIGINT;
+ALTER TABLE stats_samples ADD COLUMN views BIGINT;
+ALTER TABLE stats_samples ADD COLUMN members BIGINT;
+ALTER TABLE stats_samples ALTER COLUMN resolution SET NOT NULL;
+ALTER TABLE stats_samples ALTER COLUMN taken_at SET NOT NULL;
+ALTER TABLE stats_samples ALTER COLUMN subs SET NOT NULL;
+ALTER TABLE stats_samples ALTER COLUMN views SET NOT NULL;
+ALTER TABLE stats_samples ALTER COLUMN members SET NOT NULL;
+ALTER TABLE stats_samples ADD CONSTRAINT _stats_samples_resolution_taken_at_primary_key PRIMARY KEY ( resolution , taken_at );
\ No newline at end of file
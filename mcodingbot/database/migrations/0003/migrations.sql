@@ -0,0 +1,4 @@
+ALTER TABLE user_highlights DROP CONSTRAINT user_id_fk;
+ALTER TABLE users ALTER COLUMN user_id TYPE BIGINT USING user_id::bigint;
+ALTER TABLE user_highlights ALTER COLUMN user_id TYPE BIGINT USING user_id::bigint;
+ALTER TABLE user_highlights ADD CONSTRAINT user_id_fk FOREIGN KEY ( user_id ) REFERENCES users ( user_id ) MATCH SIMPLE ON DELETE CASCADE ON UPDATE CASCADE;
@@ -1,7 +1,8 @@
 from typing import Sequence
 
 from mcodingbot.database.models.highlight import Highlight
+from mcodingbot.database.models.stats_sample import StatsSample
 from mcodingbot.database.models.user import User
 from mcodingbot.database.models.user_highlight import UserHighlight
 
-__all__: Sequence[str] = ("User", "Highlight", "UserHighlight")
+__all__: Sequence[str] = ("User", "Highlight", "UserHighlight", "StatsSample")
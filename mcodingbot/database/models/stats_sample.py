@@ -0,0 +1,13 @@
+from apgorm import Model, types
+
+
+class StatsSample(Model):
+    # seconds covered by the sample's bucket, one per history tier
+    resolution = types.Int().field()
+    # start of the bucket
+    taken_at = types.TimestampTZ().field()
+    subs = types.BigInt().field()
+    views = types.BigInt().field()
+    members = types.BigInt().field()
+
+    primary_key = (resolution, taken_at)
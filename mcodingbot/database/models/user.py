@@ -5,7 +5,6 @@ from typing import TYPE_CHECKING
 from apgorm import ManyToMany, Model, types
 from asyncpg.exceptions import UniqueViolationError
 
-from mcodingbot.database.converters import NumericConverter
 from mcodingbot.database.models.highlight import Highlight
 
 if TYPE_CHECKING:
@@ -13,7 +12,7 @@ if TYPE_CHECKING:
 
 
 class User(Model):
-    user_id = types.Numeric().field().with_converter(NumericConverter)
+    user_id = types.BigInt().field()
     is_donor = types.Boolean().field(default=False)
     highlights: ManyToMany[Highlight, UserHighlight] = ManyToMany(
         "user_id",
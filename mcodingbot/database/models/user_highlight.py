@@ -1,13 +1,12 @@
 from apgorm import ForeignKey, Model, types
 
-from mcodingbot.database.converters import NumericConverter
 from mcodingbot.database.models.highlight import Highlight
 from mcodingbot.database.models.user import User
 
 
 class UserHighlight(Model):
     highlight_id = types.Serial().field()
-    user_id = types.Numeric().field().with_converter(NumericConverter)
+    user_id = types.BigInt().field()
 
     highlight_id_fk = ForeignKey(highlight_id, Highlight.id)
     user_id_fk = ForeignKey(user_id, User.user_id)
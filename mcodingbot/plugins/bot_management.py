@@ -4,10 +4,17 @@ import crescent
 import hikari
 
 from mcodingbot.config import CONFIG
-from mcodingbot.utils import Context, Plugin
+from mcodingbot.utils import Context, Plugin, collect_metrics, register_metrics
 
 plugin = Plugin()
 
+# statements shown by /query-stats
+MAX_QUERY_STATS = 10
+# statements are cut to this length to fit in an embed field
+MAX_STATEMENT_LENGTH = 200
+
+register_metrics("database", lambda: plugin.model.db.query_stats.stats())
+
 
 @plugin.include
 @crescent.command(
@@ -20,3 +27,50 @@ plugin = Plugin()
 async def restart(ctx: Context) -> None:
     await ctx.respond("Restarting bot...")
     await plugin.app.close()
+
+
+@plugin.include
+@crescent.command(
+    name="metrics",
+    description="Shows internal metrics of the bot.",
+    default_member_permissions=hikari.Permissions.ADMINISTRATOR,
+    dm_enabled=False,
+    guild=CONFIG.mcoding_server,
+)
+async def metrics(ctx: Context) -> None:
+    embed = hikari.Embed(title="Metrics", color=CONFIG.theme)
+    for name, values in collect_metrics().items():
+        embed.add_field(
+            name=name, value="\n".join(f"{k}: `{v}`" for k, v in values.items()) or "-"
+        )
+    await ctx.respond(embed=embed, ephemeral=True)
+
+
+@plugin.include
+@crescent.command(
+    name="query-stats",
+    description="Shows the database statements that took the most time.",
+    default_member_permissions=hikari.Permissions.ADMINISTRATOR,
+    dm_enabled=False,
+    guild=CONFIG.mcoding_server,
+)
+async def query_stats(ctx: Context) -> None:
+    embed = hikari.Embed(title="Query stats", color=CONFIG.theme)
+    for statement, stats in plugin.model.db.query_stats.slowest(MAX_QUERY_STATS):
+        if len(statement) > MAX_STATEMENT_LENGTH:
+            statement = f"{statement[:MAX_STATEMENT_LENGTH - 3]}..."
+        embed.add_field(
+            name=f"{stats.calls:,} calls, {stats.total_latency:.2f}s total",
+            value=(
+                f"```sql\n{statement}\n```"
+                f"p50 `{stats.percentile(0.5):g}ms`"
+                f" p95 `{stats.percentile(0.95):g}ms`"
+                f" p99 `{stats.percentile(0.99):g}ms`"
+                f" max `{stats.max_latency * 1_000:.1f}ms`\n"
+                f"pool wait `{stats.mean_pool_wait * 1_000:.2f}ms`"
+                f" rows `{stats.rows:,}` errors `{stats.errors:,}`"
+            ),
+        )
+    if not embed.fields:
+        embed.description = "No queries were made yet."
+    await ctx.respond(embed=embed, ephemeral=True)
@@ -8,13 +8,23 @@ import hikari
 from crescent.ext import tasks
 
 from mcodingbot.config import CONFIG
-from mcodingbot.database.models.user import User
-from mcodingbot.utils import Context, Plugin
+from mcodingbot.utils import Context, HitCounter, Plugin, register_metrics
 
 LOGGER = getLogger(__name__)
 
 plugin = Plugin()
 
+# role updates in flight at once during a reconciliation
+ROLE_UPDATE_CONCURRENCY = 5
+
+# ids of the users marked as donors in the database
+donor_ids: set[int] = set()
+donor_lookups = HitCounter()
+
+register_metrics(
+    "donors", lambda: {"donors": len(donor_ids), **donor_lookups.stats("lookup_")}
+)
+
 
 @plugin.include
 @crescent.command(
@@ -41,6 +51,12 @@ class SetDonorStatus:
         )
 
 
+@plugin.include
+@crescent.event
+async def on_start(_: hikari.StartedEvent) -> None:
+    await _reload_donors()
+
+
 @plugin.include
 @crescent.event
 async def on_member_update(event: hikari.MemberUpdateEvent) -> None:
@@ -50,43 +66,100 @@ async def on_member_update(event: hikari.MemberUpdateEvent) -> None:
 @plugin.include
 @tasks.loop(hours=1)
 async def add_donor_role() -> None:
-    if not CONFIG.mcoding_server:
+    """
+    Give the donor role to every donor that does not have it yet.
+
+    Donors are loaded in one query and compared to the cached members' roles,
+    so only members whose state differs cost a query or an API call. This
+    also reloads the donor cache, in case it drifted from the database.
+    """
+    await _reload_donors()
+
+    if not (CONFIG.mcoding_server and CONFIG.donor_role):
         return
 
-    role_add_tasks: list[asyncio.Task[None]] = []
-    for member in plugin.app.cache.get_members_view_for_guild(
-        CONFIG.mcoding_server
-    ).values():
-        role_add_tasks.append(asyncio.create_task(_give_donor_role_if_donor(member)))
+    members = plugin.app.cache.get_members_view_for_guild(CONFIG.mcoding_server)
+
+    # members with the donor or patron role that are not marked as donors
+    new_donor_ids: list[int] = []
+    # donors and patrons without the donor role
+    missing_role_ids: list[int] = []
+    for member in members.values():
+        has_donor_role = CONFIG.donor_role in member.role_ids
+        is_patron = CONFIG.patron_role in member.role_ids
+        if (has_donor_role or is_patron) and member.id not in donor_ids:
+            new_donor_ids.append(member.id)
+        if not has_donor_role and (is_patron or member.id in donor_ids):
+            missing_role_ids.append(member.id)
+
+    if new_donor_ids and not CONFIG.no_db_mode:
+        await plugin.model.db.add_donors(new_donor_ids)
+        donor_ids.update(new_donor_ids)
+
+    limiter = asyncio.Semaphore(ROLE_UPDATE_CONCURRENCY)
+
+    async def add_role(user_id: int) -> None:
+        assert CONFIG.mcoding_server and CONFIG.donor_role
+        async with limiter:
+            await plugin.app.rest.add_role_to_member(
+                CONFIG.mcoding_server, user_id, CONFIG.donor_role
+            )
+
+    results = await asyncio.gather(
+        *map(add_role, missing_role_ids), return_exceptions=True
+    )
+    if failed := sum(isinstance(result, Exception) for result in results):
+        LOGGER.error(f"Failed to give the donor role to {failed} member(s).")
 
-    await asyncio.gather(*role_add_tasks)
+
+async def _reload_donors() -> None:
+    if CONFIG.no_db_mode:
+        return
+
+    ids = await plugin.model.db.fetch_donor_ids()
+    donor_ids.clear()
+    donor_ids.update(ids)
 
 
 async def _give_donor_role_if_donor(member: hikari.Member) -> None:
-    if await _is_donor(member):
-        await _update_donor_role(member.id, is_donor=True)
+    # nothing to do for donors that are already marked and have the role
+    if member.id in donor_ids and CONFIG.donor_role in member.role_ids:
+        return
+
+    if _is_donor(member):
+        await _update_donor_role(member, is_donor=True)
 
 
-async def _is_donor(member: hikari.Member) -> bool:
+def _is_donor(member: hikari.Member) -> bool:
     if CONFIG.patron_role in member.role_ids or CONFIG.donor_role in member.role_ids:
         return True
 
-    if CONFIG.no_db_mode:
-        user = None
-    else:
-        user = await User.exists(user_id=member.id)
-    return user.is_donor if user else False
+    if member.id in donor_ids:
+        donor_lookups.hits += 1
+        return True
+    donor_lookups.misses += 1
+    return False
 
 
 async def _update_donor_role(member: int | hikari.Member, is_donor: bool) -> None:
     if not (CONFIG.mcoding_server and CONFIG.donor_role):
         return
     user_id = int(member)
-    user = await User.get_or_create(user_id)
-    user.is_donor = is_donor
-    await user.save()
+    await plugin.model.db.set_donor(user_id, is_donor)
 
-    if isinstance(member, hikari.Member) and CONFIG.donor_role in member.role_ids:
+    if is_donor:
+        donor_ids.add(user_id)
+    else:
+        donor_ids.discard(user_id)
+
+    if not isinstance(member, hikari.Member):
+        member = plugin.app.cache.get_member(CONFIG.mcoding_server, user_id) or member
+    # only call the API when the member is not cached, or the cached member's
+    # roles need to change
+    if (
+        isinstance(member, hikari.Member)
+        and (CONFIG.donor_role in member.role_ids) == is_donor
+    ):
         return
 
     if is_donor:
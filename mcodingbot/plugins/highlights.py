@@ -2,52 +2,101 @@ from __future__ import annotations
 
 import asyncio
 from collections import defaultdict
+from logging import getLogger
 from typing import NamedTuple
 
 import crescent
 import hikari
-from asyncpg import UniqueViolationError
-from floodgate import FixedMapping
+from cachetools import LRUCache, TTLCache
 
 from mcodingbot.config import CONFIG
-from mcodingbot.database.models import Highlight, User, UserHighlight
-from mcodingbot.utils import Context, Plugin
+from mcodingbot.utils import (
+    Context,
+    Cooldown,
+    DeliveryQueue,
+    HighlightIndex,
+    HitCounter,
+    Plugin,
+    analyze_message,
+    pack_key,
+    register_metrics,
+)
+
+LOGGER = getLogger(__name__)
 
 MAX_HIGHLIGHTS = 25
 MAX_HIGHLIGHT_LENGTH = 32
+MAX_DIGEST_TRIGGERS = 10
+MAX_DIGEST_CONTENT_LENGTH = 300
+# Discord's limit for an embed description
+MAX_DESCRIPTION_LENGTH = 4_096
 
 
-class SentMessageBucket(NamedTuple):
-    user: int
-    channel: int
-
-
-class TriggerBucket(NamedTuple):
-    channel: int
-    highlight: str
+class HighlightTrigger(NamedTuple):
+    message: hikari.Message
+    highlights: list[str]
 
 
 plugin = Plugin()
 highlights_group = crescent.Group("highlights")
-highlights_cache: dict[str, list[hikari.Snowflake]] = defaultdict(list)
-sent_message_cooldown: FixedMapping[SentMessageBucket] = FixedMapping(
-    *CONFIG.highlight_message_sent_cooldown
+highlight_index = HighlightIndex()
+# set once the index has been loaded from the database
+highlights_loaded = asyncio.Event()
+# keyed by (user, channel)
+sent_message_cooldown = Cooldown(*CONFIG.highlight_message_sent_cooldown)
+# keyed by (channel, highlight ID)
+trigger_cooldown = Cooldown(*CONFIG.highlight_trigger_cooldown)
+
+
+# user -> DM channel
+dm_channels: LRUCache[int, int] = LRUCache(
+    maxsize=CONFIG.highlight_dm_channel_cache_size
 )
-trigger_cooldown: FixedMapping[TriggerBucket] = FixedMapping(
-    *CONFIG.highlight_trigger_cooldown
+# users whose DMs are closed
+closed_dms: TTLCache[int, bool] = TTLCache(
+    maxsize=CONFIG.highlight_dm_channel_cache_size,
+    ttl=CONFIG.highlight_closed_dm_ttl.total_seconds(),
 )
+dm_channel_counter = HitCounter()
+closed_dm_counter = HitCounter()
 
 
-def _cache_highlight(highlight: str, *user_ids: hikari.Snowflake) -> None:
-    highlights_cache[highlight].extend(user_ids)
+async def _dm_user_highlights(user_id: int, triggers: list[HighlightTrigger]) -> None:
+    try:
+        channel_id = await _get_dm_channel(user_id)
+        await plugin.app.rest.create_message(
+            channel_id, embed=_build_highlights_embed(triggers)
+        )
+    except hikari.ForbiddenError:
+        closed_dms[user_id] = True
+
 
+highlight_dms: DeliveryQueue[HighlightTrigger] = DeliveryQueue(
+    _dm_user_highlights,
+    maxsize=CONFIG.highlight_dm_queue_size,
+    workers=CONFIG.highlight_dm_workers,
+    window=CONFIG.highlight_dm_coalesce_window.total_seconds(),
+    max_items=MAX_DIGEST_TRIGGERS,
+)
 
-def _uncache_highlight(highlight: str, *user_ids: hikari.Snowflake) -> None:
-    for user_id in user_ids:
-        highlights_cache[highlight].remove(user_id)
-        # Deletes empty arrays from the cache
-        if not highlights_cache[highlight]:
-            del highlights_cache[highlight]
+register_metrics("highlights", highlight_index.stats)
+register_metrics(
+    "highlight cooldowns",
+    lambda: {
+        "sent_message_buckets": len(sent_message_cooldown),
+        "trigger_buckets": len(trigger_cooldown),
+    },
+)
+register_metrics(
+    "highlight DMs",
+    lambda: {
+        "dm_channels": len(dm_channels),
+        "closed_dms": len(closed_dms),
+        **dm_channel_counter.stats("dm_channel_"),
+        **closed_dm_counter.stats("closed_dm_"),
+        **highlight_dms.stats(),
+    },
+)
 
 
 @plugin.include
@@ -63,19 +112,29 @@ class CreateHighlight:
             )
             return
 
-        total_highlights = await UserHighlight.count(user_id=ctx.user.id)
-        if total_highlights >= MAX_HIGHLIGHTS:
+        await highlights_loaded.wait()
+
+        if self.word in highlight_index.user_highlights(ctx.user.id):
+            await ctx.respond(
+                f'"{self.word}" is already one of your highlights.', ephemeral=True
+            )
+            return
+
+        if highlight_index.count(ctx.user.id) >= MAX_HIGHLIGHTS:
             await ctx.respond(
                 f"You can only have {MAX_HIGHLIGHTS} highlights.", ephemeral=True
             )
             return
 
-        highlight_model = await Highlight.get_or_create(highlight=self.word)
-        user = await User.get_or_create(user_id=ctx.user.id)
+        added = await plugin.model.db.add_user_highlight(
+            ctx.user.id, self.word, MAX_HIGHLIGHTS
+        )
 
-        try:
-            await highlight_model.users.add(user)
-        except UniqueViolationError:
+        if added is None:
+            await ctx.respond(
+                f"You can only have {MAX_HIGHLIGHTS} highlights.", ephemeral=True
+            )
+        elif not added:
             await ctx.respond(
                 f'"{self.word}" is already one of your highlights.', ephemeral=True
             )
@@ -83,7 +142,7 @@ class CreateHighlight:
             await ctx.respond(
                 f'Added "{self.word}" to your highlights.', ephemeral=True
             )
-            _cache_highlight(self.word, ctx.user.id)
+            highlight_index.add(self.word, ctx.user.id)
 
 
 @plugin.include
@@ -93,19 +152,13 @@ class DeleteHighlight:
     word = crescent.option(str, "The regex for the highlight.")
 
     async def callback(self, ctx: Context) -> None:
-        highlight = await Highlight.exists(highlight=self.word)
-
-        was_deleted = False
-        if highlight:
-            deleted_highlights = (
-                await UserHighlight.delete_query()
-                .where(highlight_id=highlight.id, user_id=ctx.user.id)
-                .execute()
-            )
-            was_deleted = bool(len(deleted_highlights))
+        await highlights_loaded.wait()
 
-        if was_deleted:
-            _uncache_highlight(self.word, ctx.user.id)
+        has_highlight = self.word in highlight_index.user_highlights(ctx.user.id)
+        if has_highlight and await plugin.model.db.remove_user_highlight(
+            ctx.user.id, self.word
+        ):
+            highlight_index.remove(self.word, ctx.user.id)
             await ctx.respond(
                 f'Removed "{self.word}" from your highlights.', ephemeral=True
             )
@@ -120,13 +173,9 @@ class DeleteHighlight:
 @highlights_group.child
 @crescent.command(name="list", description="List all of your highlights.")
 async def list_highlights(ctx: Context) -> None:
-    user = await User.exists(user_id=ctx.user.id)
+    await highlights_loaded.wait()
 
-    if user is None:
-        await ctx.respond("You do not have any highlights.", ephemeral=True)
-        return
-
-    highlights = await user.highlights.fetchmany()
+    highlights = highlight_index.user_highlights(ctx.user.id)
 
     if not highlights:
         await ctx.respond("You do not have any highlights.", ephemeral=True)
@@ -134,7 +183,7 @@ async def list_highlights(ctx: Context) -> None:
 
     embed = hikari.Embed(
         title="Your Highlights",
-        description="\n".join(hl.highlight for hl in highlights),
+        description="\n".join(sorted(highlights, key=str.casefold)),
         color=CONFIG.theme,
     )
     await ctx.respond(embed=embed, ephemeral=True)
@@ -143,43 +192,86 @@ async def list_highlights(ctx: Context) -> None:
 @plugin.include
 @crescent.event
 async def on_start(_: hikari.StartedEvent) -> None:
-    if CONFIG.no_db_mode:
-        return
+    highlight_dms.start()
 
-    highlights = await Highlight.fetchmany()
+    try:
+        if CONFIG.no_db_mode:
+            return
 
-    for highlight, user_highlights in zip(
-        highlights,
-        await asyncio.gather(
-            *(
-                UserHighlight.fetchmany(highlight_id=highlight.id)
-                for highlight in highlights
-            )
-        ),
-    ):
-        _cache_highlight(
-            highlight.highlight,
-            *(user_highlight.user_id for user_highlight in user_highlights),
+        async for highlight, user_id in plugin.model.db.iter_highlight_subscriptions():
+            highlight_index.add(highlight, user_id)
+
+        LOGGER.info(
+            f"Loaded {len(highlight_index)} highlights"
+            f" ({highlight_index.memory_usage():,} bytes)."
         )
+    finally:
+        highlights_loaded.set()
 
 
-async def _dm_user_highlight(
-    triggering_message: hikari.Message, triggers: list[str], user_id: int
-) -> None:
-    _avatar_url = triggering_message.author.avatar_url
-    avatar_url = _avatar_url.url if _avatar_url else None
-    embed = (
-        hikari.Embed(
-            title="Highlight Triggered",
-            url=triggering_message.make_link(CONFIG.mcoding_server),
-            description=triggering_message.content,
-            color=CONFIG.theme,
-        )
-        .set_footer(f"Highlight(s): {', '.join(triggers)}")
-        .set_author(name=triggering_message.author.username, icon=avatar_url)
-    )
+async def _get_dm_channel(user_id: int) -> int:
+    if (channel_id := dm_channels.get(user_id)) is not None:
+        dm_channel_counter.hits += 1
+        return channel_id
+
+    dm_channel_counter.misses += 1
     channel = await plugin.app.rest.create_dm_channel(user_id)
-    await channel.send(embed=embed)
+    dm_channels[user_id] = channel.id
+    return channel.id
+
+
+@plugin.include
+@crescent.event
+async def on_stopping(_: hikari.StoppingEvent) -> None:
+    await highlight_dms.stop()
+
+
+def _build_highlights_embed(triggers: list[HighlightTrigger]) -> hikari.Embed:
+    highlights = dict.fromkeys(hl for trigger in triggers for hl in trigger.highlights)
+    footer = f"Highlight(s): {', '.join(highlights)}"
+
+    if len(triggers) == 1:
+        message = triggers[0].message
+        _avatar_url = message.author.avatar_url
+        avatar_url = _avatar_url.url if _avatar_url else None
+        return (
+            hikari.Embed(
+                title="Highlight Triggered",
+                url=message.make_link(CONFIG.mcoding_server),
+                description=message.content,
+                color=CONFIG.theme,
+            )
+            .set_footer(footer)
+            .set_author(name=message.author.username, icon=avatar_url)
+        )
+
+    lines: list[str] = []
+    length = 0
+    for index, trigger in enumerate(triggers):
+        message = trigger.message
+        content = message.content or ""
+        if len(content) > MAX_DIGEST_CONTENT_LENGTH:
+            content = f"{content[:MAX_DIGEST_CONTENT_LENGTH - 3]}..."
+        link = message.make_link(CONFIG.mcoding_server)
+        line = (
+            f"**{message.author.username}** in <#{message.channel_id}>"
+            f" ([jump]({link})): {content}"
+        )
+
+        # leave room for the separator and the line about omitted triggers
+        omitted = f"...and {len(triggers) - index} more."
+        if length + len(line) + len(omitted) + 4 > MAX_DESCRIPTION_LENGTH:
+            lines.append(omitted)
+            break
+
+        lines.append(line)
+        length += len(line) + 2
+
+    return hikari.Embed(
+        title=f"{len(triggers)} Highlights Triggered",
+        description="\n\n".join(lines),
+        color=CONFIG.theme,
+    ).set_footer(footer)
 
 
 @plugin.include
@@ -188,39 +280,42 @@ async def on_message(event: hikari.GuildMessageCreateEvent) -> None:
     if event.is_bot:
         return
 
-    message_bucket = SentMessageBucket(user=event.author_id, channel=event.channel_id)
+    message_bucket = pack_key(event.author_id, event.channel_id)
     sent_message_cooldown.reset(message_bucket)
     sent_message_cooldown.trigger(message_bucket)
 
-    if not event.content:
+    if not (analysis := analyze_message(event.message)):
         return
 
-    highlights: defaultdict[hikari.Snowflake, list[str]] = defaultdict(list)
+    # messages sent while the cache is still loading wait for it instead of
+    # being missed.
+    await highlights_loaded.wait()
 
-    for highlight, users in highlights_cache.items():
-        if highlight.casefold() in event.content.casefold():
-            retry_after = trigger_cooldown.trigger(
-                TriggerBucket(channel=event.channel_id, highlight=highlight)
-            )
-            if retry_after:
-                # this highlight has been triggered in this channel too
-                # many times, so it's on cooldown.
-                continue
+    highlights: defaultdict[int, list[str]] = defaultdict(list)
 
-            for user_id in users:
-                if user_id == event.author.id:
-                    continue
-                highlights[user_id].append(highlight)
+    for highlight, users in highlight_index.find_folded(analysis.folded).items():
+        retry_after = trigger_cooldown.trigger(
+            pack_key(event.channel_id, highlight_index.id_of(highlight))
+        )
+        if retry_after:
+            # this highlight has been triggered in this channel too
+            # many times, so it's on cooldown.
+            continue
+
+        for user_id in users:
+            if user_id == event.author.id:
+                continue
+            highlights[user_id].append(highlight)
 
     for user_id, hls in highlights.items():
-        if not sent_message_cooldown.can_trigger(
-            SentMessageBucket(user=user_id, channel=event.channel_id)
-        ):
+        if not sent_message_cooldown.can_trigger(pack_key(user_id, event.channel_id)):
             # the user has sent messages in this channel, so highlights are
             # not active for them in this channel.
             continue
-        asyncio.ensure_future(
-            _dm_user_highlight(
-                triggering_message=event.message, triggers=hls, user_id=user_id
-            )
-        )
+
+        if user_id in closed_dms:
+            closed_dm_counter.hits += 1
+            continue
+        closed_dm_counter.misses += 1
+
+        highlight_dms.push(user_id, HighlightTrigger(event.message, hls))
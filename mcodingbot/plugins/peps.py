@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import re
 from contextlib import suppress
 from datetime import datetime, timedelta, timezone
@@ -9,20 +10,26 @@ import crescent
 import hikari
 from cachetools import TTLCache
 from crescent.ext import tasks
-from floodgate import FixedMapping
 
 from mcodingbot.config import CONFIG
-from mcodingbot.utils import Context, PEPInfo, PEPManager, Plugin
-
-
-class PEPBucket(NamedTuple):
-    pep: int
-    channel: int
+from mcodingbot.utils import (
+    Context,
+    Cooldown,
+    MessageAnalysis,
+    PEPInfo,
+    PEPManager,
+    Plugin,
+    analyze_message,
+    pack_key,
+    register_metrics,
+)
 
 
 class MessageInfo(NamedTuple):
     message: int
     peps: set[PEPInfo]
+    # hash of the content the response was built from
+    fingerprint: int
 
 
 PEP_REGEX = re.compile(
@@ -31,23 +38,33 @@ PEP_REGEX = re.compile(
 DISMISS_BUTTON_ID = "dismiss"
 MAX_AGE_FOR_SEND = timedelta(minutes=1)
 MAX_AGE_FOR_EDIT = timedelta(minutes=5)
+EDIT_DEBOUNCE = timedelta(seconds=2)
+MAX_SEARCH_RESULTS = 10
+MAX_QUERY_LENGTH = 100
+MAX_TITLE_LENGTH = 256
 
 recent_pep_responses: TTLCache[int, MessageInfo] = TTLCache(
     maxsize=10_000, ttl=MAX_AGE_FOR_EDIT.total_seconds()
 )
+# message id -> latest edit, for messages whose edits are being debounced
+pending_edits: dict[int, hikari.GuildMessageUpdateEvent] = {}
 plugin = Plugin()
-pep_manager = PEPManager()
-pep_cooldown: FixedMapping[PEPBucket] = FixedMapping(*CONFIG.pep_cooldown)
+pep_manager = PEPManager(CONFIG.pep_snapshot_path)
+# keyed by (pep, channel)
+pep_cooldown = Cooldown(*CONFIG.pep_cooldown)
+
+register_metrics("pep cooldowns", lambda: {"buckets": len(pep_cooldown)})
+register_metrics("pep search", pep_manager.stats)
 
 
 def trigger_cooldowns(peps: Iterable[PEPInfo], channel_id: int) -> None:
     for pep in peps:
-        pep_cooldown.trigger(PEPBucket(pep=pep.number, channel=channel_id))
+        pep_cooldown.trigger(pack_key(pep.number, channel_id))
 
 
 def reset_cooldowns(peps: Iterable[PEPInfo], channel_id: int) -> None:
     for pep in peps:
-        pep_cooldown.reset(PEPBucket(pep=pep.number, channel=channel_id))
+        pep_cooldown.reset(pack_key(pep.number, channel_id))
 
 
 def filter_can_send(peps: Iterable[PEPInfo], channel_id: int) -> Iterable[PEPInfo]:
@@ -57,7 +74,7 @@ def filter_can_send(peps: Iterable[PEPInfo], channel_id: int) -> Iterable[PEPInf
     """
 
     def is_sendable(pep: PEPInfo) -> bool:
-        return pep_cooldown.can_trigger(PEPBucket(pep=pep.number, channel=channel_id))
+        return pep_cooldown.can_trigger(pack_key(pep.number, channel_id))
 
     return filter(is_sendable, peps)
 
@@ -113,18 +130,47 @@ class PEPCommand:
         await ctx.respond(embed=pep.embed())
 
 
+@plugin.include
+@crescent.command(
+    name="pep-search", description="Search the titles, authors and status of PEPs."
+)
+class PEPSearchCommand:
+    query = crescent.option(
+        str, "The words to search for.", max_length=MAX_QUERY_LENGTH
+    )
+
+    async def callback(self, ctx: Context) -> None:
+        if not (
+            peps := pep_manager.full_text_search(self.query, limit=MAX_SEARCH_RESULTS)
+        ):
+            await ctx.respond(f"No PEPs found for {self.query!r}.", ephemeral=True)
+            return
+
+        title = f"PEPs matching {self.query!r}"
+        if len(title) > MAX_TITLE_LENGTH:
+            # escaped characters can make the query's repr longer than the query
+            title = f"{title[:MAX_TITLE_LENGTH - 3]}..."
+
+        embed = hikari.Embed(
+            title=title,
+            description="\n".join(f"{pep} ({pep.status})" for pep in peps),
+            color=CONFIG.theme,
+        )
+        await ctx.respond(embed=embed)
+
+
 def within_age_cutoff(message_created_at: datetime) -> bool:
     return datetime.now(timezone.utc) - message_created_at <= MAX_AGE_FOR_SEND
 
 
-def get_pep_refs(content: hikari.UndefinedNoneOr[str]) -> Iterable[PEPInfo]:
+def get_pep_refs(analysis: MessageAnalysis | None) -> Iterable[PEPInfo]:
     """
-    Return a sorted list of all the peps mentioned in a string.
+    Return a sorted list of all the peps mentioned in a message.
     """
-    if not content:
+    if not analysis or not analysis.mentions("pep"):
         return []
 
-    peps = sorted(int(ref.group("pep")) for ref in PEP_REGEX.finditer(content))
+    peps = sorted(int(ref.group("pep")) for ref in PEP_REGEX.finditer(analysis.content))
 
     return filter(None, map(pep_manager.get, peps))
 
@@ -154,11 +200,11 @@ async def on_message(event: hikari.MessageCreateEvent) -> None:
     Send a message with an embed containing the peps mentioned in a message
     that have not been mentioned recently.
     """
-    if not event.message.content or event.author.is_bot:
+    if event.author.is_bot:
         return
 
     if peps := set(
-        filter_can_send(get_pep_refs(event.message.content), event.channel_id)
+        filter_can_send(get_pep_refs(analyze_message(event.message)), event.channel_id)
     ):
         trigger_cooldowns(peps, event.channel_id)
 
@@ -166,7 +212,9 @@ async def on_message(event: hikari.MessageCreateEvent) -> None:
         response = await event.message.respond(
             embed=embed, component=get_dismiss_button(event.author.id), reply=True
         )
-        recent_pep_responses[event.message.id] = MessageInfo(response.id, peps)
+        recent_pep_responses[event.message.id] = MessageInfo(
+            response.id, peps, hash(event.message.content)
+        )
 
 
 @plugin.include
@@ -178,13 +226,46 @@ async def on_message_edit(event: hikari.GuildMessageUpdateEvent) -> None:
 
     Pep messages can immediately show up if the pep number was edited out of
     the parent message.
+
+    Edits are debounced: only the latest edit made within `EDIT_DEBOUNCE` of
+    the first one is handled. The age of the message is checked when the
+    first edit arrives, so debouncing can not push it past the cutoff.
     """
     if not event.author or event.author.is_bot:
         return
 
-    peps = set(get_pep_refs(event.message.content))
+    # updates that do not touch the content, like embeds being resolved
+    if event.message.content is hikari.UNDEFINED:
+        return
+
+    debouncing = event.message.id in pending_edits
+    pending_edits[event.message.id] = event
+    if debouncing:
+        return
+
+    can_send = within_age_cutoff(event.message.created_at)
+    await asyncio.sleep(EDIT_DEBOUNCE.total_seconds())
+    # the message may have been deleted in the meantime
+    if latest := pending_edits.pop(event.message.id, None):
+        await handle_message_edit(latest, can_send=can_send)
+
+
+async def handle_message_edit(
+    event: hikari.GuildMessageUpdateEvent, *, can_send: bool
+) -> None:
+    """
+    `can_send` is whether a new response may be sent if the message did not
+    have one yet.
+    """
+    assert event.author
+    fingerprint = hash(event.message.content)
+    original = recent_pep_responses.get(event.message.id)
+    if original and original.fingerprint == fingerprint:
+        return
+
+    peps = set(get_pep_refs(analyze_message(event.message)))
 
-    if original := recent_pep_responses.get(event.message.id):
+    if original:
         # reset the cooldown for any peps that were removed
         reset_cooldowns(original.peps - peps, event.channel_id)
 
@@ -194,6 +275,13 @@ async def on_message_edit(event: hikari.GuildMessageUpdateEvent) -> None:
         final = set(filter_can_send(peps, event.channel_id))
         trigger_cooldowns(final, event.channel_id)
 
+        if final == original.peps:
+            # the response would not change
+            recent_pep_responses[event.message.id] = original._replace(
+                fingerprint=fingerprint
+            )
+            return
+
         embed = get_peps_embed(final)
 
         with suppress(hikari.NotFoundError):
@@ -202,21 +290,21 @@ async def on_message_edit(event: hikari.GuildMessageUpdateEvent) -> None:
                     event.channel_id, original.message, embed=embed
                 )
                 recent_pep_responses[event.message.id] = MessageInfo(
-                    original.message, final
+                    original.message, final, fingerprint
                 )
             else:
                 await plugin.app.rest.delete_message(event.channel_id, original.message)
                 del recent_pep_responses[event.message.id]
-    elif (peps := set(filter_can_send(peps, event.channel_id))) and within_age_cutoff(
-        event.message.created_at
-    ):
+    elif can_send and (peps := set(filter_can_send(peps, event.channel_id))):
         embed = get_peps_embed(peps)
         assert embed
         trigger_cooldowns(peps, event.channel_id)
         response = await event.message.respond(
             embed=embed, component=get_dismiss_button(event.author.id), reply=True
         )
-        recent_pep_responses[event.message.id] = MessageInfo(response.id, peps)
+        recent_pep_responses[event.message.id] = MessageInfo(
+            response.id, peps, fingerprint
+        )
 
 
 @plugin.include
@@ -225,6 +313,8 @@ async def on_message_delete(event: hikari.GuildMessageDeleteEvent) -> None:
     """
     Pep messages can immediately show up if the parent message was deleted.
     """
+    pending_edits.pop(event.message_id, None)
+
     if original := recent_pep_responses.get(event.message_id):
         reset_cooldowns(original.peps, event.channel_id)
 
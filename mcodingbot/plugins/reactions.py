@@ -3,7 +3,7 @@ import re
 import crescent
 import hikari
 
-from mcodingbot.utils import Plugin
+from mcodingbot.utils import Plugin, analyze_message
 
 RUST_REGEX = re.compile(r"(\brust\b|\bblazingly\s+fast\b)", flags=re.I)
 
@@ -17,8 +17,9 @@ async def on_message(event: hikari.MessageCreateEvent) -> None:
         await event.message.add_reaction("👋")
 
     elif (
-        event.message.content
-        and RUST_REGEX.search(event.message.content)
-        and "🚀" in event.message.content
+        (analysis := analyze_message(event.message))
+        and "🚀" in analysis.content
+        and (analysis.mentions("rust") or analysis.mentions("blazingly"))
+        and RUST_REGEX.search(analysis.content)
     ):
         await event.message.add_reaction("🚀")
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
 from dataclasses import dataclass
+from datetime import timedelta
 from math import log2
-from typing import Any
 
 import crescent
 import hikari
@@ -11,7 +13,14 @@ from crescent.ext import tasks
 from hikari import PermissibleGuildChannel
 
 from mcodingbot.config import CONFIG
-from mcodingbot.utils import Context, Plugin
+from mcodingbot.utils import (
+    ChannelRenamer,
+    Context,
+    Plugin,
+    TieredSeries,
+    YouTubeStats,
+    register_metrics,
+)
 
 LOGGER = logging.getLogger(__file__)
 
@@ -19,19 +28,71 @@ LOGGER = logging.getLogger(__file__)
 plugin = Plugin()
 
 
+async def _rename_channel(channel_id: int, name: str) -> None:
+    await plugin.app.rest.edit_channel(channel_id, name=name)
+
+
+channel_renamer = ChannelRenamer(_rename_channel)
+register_metrics("stat channels", channel_renamer.stats)
+youtube_stats = YouTubeStats(
+    CONFIG.mcoding_yt_id,
+    CONFIG.yt_api_key,
+    ttl=CONFIG.yt_stats_ttl,
+    daily_quota=CONFIG.yt_daily_quota,
+)
+register_metrics("youtube stats", youtube_stats.stats)
+
+# (resolution, retention) of each tier of the stats history
+HISTORY_TIERS = (
+    (timedelta(minutes=5), timedelta(days=2)),
+    (timedelta(hours=1), timedelta(days=35)),
+    (timedelta(days=1), timedelta(days=730)),
+)
+HISTORY_PERIODS = {
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+    "month": timedelta(days=30),
+}
+# samples of (subs, views, members)
+stats_history = TieredSeries(HISTORY_TIERS, width=3)
+# set once the persisted history was loaded. Samples recorded before that
+# would make the older persisted buckets be ignored.
+history_loaded = asyncio.Event()
+
+
 @plugin.include
 @crescent.command(name="stats", description="Exact values for mCoding statistics")
-async def stats(ctx: Context) -> None:
-    embed = hikari.Embed(
-        title="mCoding stats",
-        color=CONFIG.theme,
-        description=(
-            f"Server members: `{_last_known_stats.member_count:,}`\n"
-            f"Subscribers: `{_last_known_stats.subs:,}`\n"
-            f"Views: `{_last_known_stats.views:,}`"
-        ),
+class StatsCommand:
+    history = crescent.option(
+        bool, "Show how the stats changed over time.", default=False
     )
-    await ctx.respond(embed=embed)
+
+    async def callback(self, ctx: Context) -> None:
+        stats = await get_stats()
+        embed = hikari.Embed(
+            title="mCoding stats",
+            color=CONFIG.theme,
+            description=(
+                f"Server members: `{stats.member_count:,}`\n"
+                f"Subscribers: `{stats.subs:,}`\n"
+                f"Views: `{stats.views:,}`"
+            ),
+        )
+
+        if self.history:
+            for name, period in HISTORY_PERIODS.items():
+                if (delta := stats_history.delta(period)) is None:
+                    value = "Not enough history yet."
+                else:
+                    subs, views, members = delta
+                    value = (
+                        f"Server members: `{members:+,}`\n"
+                        f"Subscribers: `{subs:+,}`\n"
+                        f"Views: `{views:+,}`"
+                    )
+                embed.add_field(f"Last {name}", value, inline=True)
+
+        await ctx.respond(embed=embed)
 
 
 @plugin.include
@@ -42,6 +103,70 @@ async def loop() -> None:
     except Exception:
         LOGGER.error("Failed to update channel stats:", exc_info=True)
 
+    await history_loaded.wait()
+    record_sample()
+
+
+@plugin.include
+@tasks.loop(hours=1)
+async def flush_history() -> None:
+    await save_history()
+
+
+@plugin.include
+@crescent.event
+async def on_start(_: hikari.StartedEvent) -> None:
+    try:
+        if CONFIG.no_db_mode:
+            return
+
+        oldest = stats_history.retention_cutoffs(time.time())
+        samples = await plugin.model.db.fetch_stats_samples(oldest)
+        for resolution, tier_samples in samples.items():
+            stats_history.load(resolution, tier_samples)
+    finally:
+        history_loaded.set()
+
+
+@plugin.include
+@crescent.event
+async def on_stopping(_: hikari.StoppingEvent) -> None:
+    await channel_renamer.stop()
+    await save_history()
+
+
+def record_sample() -> None:
+    if not (_member_count_seeded and _last_known_stats.subs):
+        return
+
+    stats_history.add(
+        time.time(),
+        (
+            _last_known_stats.subs,
+            _last_known_stats.views,
+            _last_known_stats.member_count,
+        ),
+    )
+
+
+async def save_history() -> None:
+    """
+    Write the buckets that changed since the last save in one batch, and
+    delete the ones that aged out of their tier.
+    """
+    if CONFIG.no_db_mode:
+        return
+
+    changes = stats_history.drain_changes()
+    try:
+        await plugin.model.db.upsert_stats_samples(changes)
+        await plugin.model.db.prune_stats_samples(
+            stats_history.retention_cutoffs(time.time())
+        )
+    except Exception:
+        stats_history.requeue_changes(changes)
+        LOGGER.error("Failed to save stats history:", exc_info=True)
+
 
 async def update_channels() -> None:
     if not CONFIG.mcoding_server:
@@ -54,15 +179,18 @@ async def update_channels() -> None:
             return None
         return plugin.app.cache.get_guild_channel(channel_id)
 
+    def rename(channel: PermissibleGuildChannel, name: str) -> None:
+        channel_renamer.request(channel.id, name, current=channel.name)
+
     # update subs count
     if ch := get_channel(CONFIG.sub_count_channel):
-        await ch.edit(name=f"Subs: {display_stats(stats.subs)}")
+        rename(ch, f"Subs: {display_stats(stats.subs)}")
     else:
         LOGGER.warning("No sub count channel to update stats for.")
 
     # update views count
     if ch := get_channel(CONFIG.view_count_channel):
-        await ch.edit(name=f"Views: {display_stats(stats.views)}")
+        rename(ch, f"Views: {display_stats(stats.views)}")
     else:
         LOGGER.warning("No view count channel to update stats for.")
 
@@ -70,25 +198,41 @@ async def update_channels() -> None:
     if not (ch := get_channel(CONFIG.member_count_channel)):
         return LOGGER.warning("No member count channel to update stats for.")
 
-    guild = plugin.app.cache.get_guild(CONFIG.mcoding_server)
-    if not guild:
-        return LOGGER.warning("Couldn't find mCoding guild, not updating member count.")
+    if not _member_count_seeded:
+        return LOGGER.warning("Member count is not known yet, not updating it.")
+
+    rename(ch, f"Members: {display_stats(_last_known_stats.member_count)}")
+
+
+@plugin.include
+@crescent.event
+async def on_guild_available(event: hikari.GuildAvailableEvent) -> None:
+    """
+    Seed the member count. The count sent when a guild becomes available is
+    exact, and it is kept up to date from member events after that.
+    """
+    global _member_count_seeded
+
+    if event.guild_id != CONFIG.mcoding_server:
+        return
 
-    guild_approx_members = guild.member_count
-    if guild_approx_members is None:
-        return LOGGER.warning("Cached guild has no aproximate member count.")
+    if (member_count := event.guild.member_count) is not None:
+        _last_known_stats.member_count = member_count
+        _member_count_seeded = True
 
-    cached_members = len(plugin.app.cache.get_members_view_for_guild(guild.id))
 
-    # at startup, cached_members will be very small because it relies on
-    # the guild being chuncked, which happens *after* startup. We can't
-    # just rely on the aproximate_member_count though, because that is
-    # never updated after the bot first starts.
-    member_count = max(guild_approx_members, cached_members)
+@plugin.include
+@crescent.event
+async def on_member_create(event: hikari.MemberCreateEvent) -> None:
+    if event.guild_id == CONFIG.mcoding_server:
+        _last_known_stats.member_count += 1
 
-    _last_known_stats.member_count = member_count
 
-    await ch.edit(name=f"Members: {display_stats(member_count)}")
+@plugin.include
+@crescent.event
+async def on_member_delete(event: hikari.MemberDeleteEvent) -> None:
+    if event.guild_id == CONFIG.mcoding_server:
+        _last_known_stats.member_count -= 1
 
 
 @dataclass
@@ -98,48 +242,15 @@ class Stats:
     member_count: int
 
 
-BASE_URL = "https://www.googleapis.com/youtube/v3/channels"
 _last_known_stats = Stats(0, 0, 0)
+# whether `_last_known_stats.member_count` was seeded from the guild
+_member_count_seeded = False
 
 
 async def get_stats() -> Stats:
-    link = (
-        f"{BASE_URL}?part=statistics&id={CONFIG.mcoding_yt_id}"
-        f"&key={CONFIG.yt_api_key}"
-    )
-
-    async with plugin.model.session.get(link) as res:
-        res.raise_for_status()
-        response: dict[str, Any] = await res.json()
-
-    if not response:
-        LOGGER.error("Received 2XX but no data.")
-        return _last_known_stats
-
-    items = response.get("items")
-    if not items:
-        LOGGER.error("Response did not contain 'items'.")
-        return _last_known_stats
-
-    channel = items[0]
-    if channel.get("id") != CONFIG.mcoding_yt_id:
-        LOGGER.error("Channel ID was not mCoding.")
-        return _last_known_stats
-
-    statistics = channel.get("statistics")
-    if not statistics:
-        LOGGER.error("mCoding channel did not contain 'statistics'.")
-        return _last_known_stats
-
-    subs = int(statistics.get("subscriberCount", 0))
-    views = int(statistics.get("viewCount", 0))
-
-    if not (subs and views):
-        LOGGER.error("Statistics did not contain subscriberCount and viewCount.")
-        return _last_known_stats
-
-    _last_known_stats.subs = subs
-    _last_known_stats.views = views
+    if statistics := await youtube_stats.fetch(plugin.model):
+        _last_known_stats.subs = statistics.subscribers
+        _last_known_stats.views = statistics.views
     return _last_known_stats
 
 
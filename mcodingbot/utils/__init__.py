@@ -1,7 +1,39 @@
 from typing import Sequence
 
+from mcodingbot.utils.channels import ChannelRenamer
+from mcodingbot.utils.cooldowns import Cooldown, pack_key
+from mcodingbot.utils.delivery import DeliveryQueue
+from mcodingbot.utils.fulltext import FullTextIndex
+from mcodingbot.utils.highlights import HighlightIndex, HighlightMatcher
+from mcodingbot.utils.messages import MessageAnalysis, analyze_message
+from mcodingbot.utils.metrics import HitCounter, collect_metrics, register_metrics
 from mcodingbot.utils.peps import PEPInfo, PEPManager
 from mcodingbot.utils.plugins import Context, Plugin
-from mcodingbot.utils.search import fuzzy_search
+from mcodingbot.utils.search import FuzzyIndex, fuzzy_search
+from mcodingbot.utils.timeseries import RingSeries, TieredSeries
+from mcodingbot.utils.youtube import ChannelStatistics, YouTubeStats
 
-__all__: Sequence[str] = ("PEPInfo", "PEPManager", "Context", "Plugin", "fuzzy_search")
+__all__: Sequence[str] = (
+    "ChannelRenamer",
+    "ChannelStatistics",
+    "Cooldown",
+    "DeliveryQueue",
+    "FullTextIndex",
+    "FuzzyIndex",
+    "HighlightIndex",
+    "HighlightMatcher",
+    "HitCounter",
+    "MessageAnalysis",
+    "PEPInfo",
+    "PEPManager",
+    "RingSeries",
+    "TieredSeries",
+    "YouTubeStats",
+    "Context",
+    "Plugin",
+    "analyze_message",
+    "fuzzy_search",
+    "pack_key",
+    "collect_metrics",
+    "register_metrics",
+)
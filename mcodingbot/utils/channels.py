@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from datetime import timedelta
+from logging import getLogger
+from typing import Awaitable, Callable, Sequence
+
+__all__: Sequence[str] = ("ChannelRenamer",)
+
+_LOG = getLogger(__name__)
+
+# Discord allows each channel to be renamed twice every ten minutes.
+RENAMES_PER_PERIOD = 2
+RENAME_PERIOD = timedelta(minutes=10)
+
+
+class ChannelRenamer:
+    """
+    Keeps channel names in sync with the names they should have.
+
+    Requesting the name a channel already has costs nothing. The channel's
+    current name is compared against when it is known, so names changed
+    outside the bot are corrected. Otherwise, and while a rename is in
+    flight, the last name applied is used. Each channel's rename budget is
+    tracked locally, and when it is spent the rename waits until the budget
+    allows it, applying only the latest requested name.
+    """
+
+    def __init__(self, rename: Callable[[int, str], Awaitable[None]]) -> None:
+        self._rename = rename
+        self._period = RENAME_PERIOD.total_seconds()
+
+        self._applied: dict[int, str] = {}
+        self._wanted: dict[int, str] = {}
+        self._tasks: dict[int, asyncio.Task[None]] = {}
+        # monotonic times of the renames within the last period, per channel
+        self._renamed_at: dict[int, deque[float]] = {}
+
+        self._renamed = 0
+        self._skipped = 0
+        self._failed = 0
+
+    def request(
+        self, channel_id: int, name: str, *, current: str | None = None
+    ) -> None:
+        """
+        Request that a channel be named `name`. `current` is the name the
+        channel is known to have, e.g. from the cache.
+        """
+        self._wanted[channel_id] = name
+        if channel_id in self._tasks:
+            return
+
+        if current is not None:
+            self._applied[channel_id] = current
+        if self._applied.get(channel_id) == name:
+            self._skipped += 1
+            return
+
+        self._tasks[channel_id] = asyncio.ensure_future(self._reconcile(channel_id))
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "renamed": self._renamed,
+            "skipped": self._skipped,
+            "failed": self._failed,
+            "waiting": len(self._tasks),
+        }
+
+    async def _reconcile(self, channel_id: int) -> None:
+        try:
+            while (name := self._wanted[channel_id]) != self._applied.get(channel_id):
+                if retry_after := self._retry_after(channel_id):
+                    await asyncio.sleep(retry_after)
+                    continue
+
+                try:
+                    await self._rename(channel_id, name)
+                except Exception:
+                    self._failed += 1
+                    _LOG.exception(f"Failed to rename channel {channel_id}.")
+                    return
+
+                self._applied[channel_id] = name
+                self._renamed_at[channel_id].append(time.monotonic())
+                self._renamed += 1
+        finally:
+            # removed in the same step as the last check of the wanted name,
+            # so a request can never be left without a task to apply it.
+            del self._tasks[channel_id]
+
+    def _retry_after(self, channel_id: int) -> float:
+        """
+        Return how many seconds until the channel can be renamed again, or 0
+        if it can be renamed now.
+        """
+        renamed_at = self._renamed_at.setdefault(
+            channel_id, deque(maxlen=RENAMES_PER_PERIOD)
+        )
+        if len(renamed_at) < RENAMES_PER_PERIOD:
+            return 0.0
+        return max(renamed_at[0] + self._period - time.monotonic(), 0.0)
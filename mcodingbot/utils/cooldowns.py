@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import time
+from datetime import timedelta
+from typing import Sequence
+
+__all__: Sequence[str] = ("Cooldown", "pack_key")
+
+
+def pack_key(first: int, second: int) -> int:
+    """
+    Combine two snowflakes (or other unsigned 64 bit ints) into one int key.
+    """
+    return first << 64 | second
+
+
+class Cooldown:
+    """
+    Allows each key to be triggered `capacity` times per `period`.
+
+    Every key is stored as a single float, the time at which its bucket is
+    full again (the generic cell rate algorithm). Buckets that are full again
+    are idle and are swept at most once per period, so memory is bounded by
+    the number of keys that were triggered during the last period.
+    """
+
+    def __init__(self, capacity: int, period: timedelta) -> None:
+        self._period = period.total_seconds()
+        self._interval = self._period / capacity
+        self._burst = self._period - self._interval
+
+        self._buckets: dict[int, float] = {}
+        self._next_sweep = time.monotonic() + self._period
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def can_trigger(self, key: int) -> bool:
+        return self._retry_after(key, time.monotonic()) is None
+
+    def trigger(self, key: int) -> float | None:
+        """
+        Trigger the cooldown for a key. If the key is on cooldown, nothing is
+        changed and the number of seconds until it can be triggered again is
+        returned.
+        """
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._sweep(now)
+
+        if (retry_after := self._retry_after(key, now)) is not None:
+            return retry_after
+
+        self._buckets[key] = max(self._buckets.get(key, now), now) + self._interval
+        return None
+
+    def reset(self, key: int) -> None:
+        self._buckets.pop(key, None)
+
+    def _retry_after(self, key: int, now: float) -> float | None:
+        full_at = self._buckets.get(key)
+        if full_at is None:
+            return None
+
+        retry_after = full_at - now - self._burst
+        return retry_after if retry_after > 0 else None
+
+    def _sweep(self, now: float) -> None:
+        self._buckets = {
+            key: full_at for key, full_at in self._buckets.items() if full_at > now
+        }
+        self._next_sweep = now + self._period
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import asyncio
+from logging import getLogger
+from typing import Awaitable, Callable, Generic, Sequence, TypeVar
+
+__all__: Sequence[str] = ("DeliveryQueue",)
+
+_LOG = getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class DeliveryQueue(Generic[T]):
+    """
+    Bounded queue that coalesces items per recipient and delivers them with a
+    fixed pool of workers.
+
+    Items pushed for a recipient within `window` seconds of the first one are
+    delivered together in a single call to `deliver`. Once `maxsize`
+    recipients are waiting, items for new recipients are dropped rather than
+    letting the backlog grow.
+    """
+
+    def __init__(
+        self,
+        deliver: Callable[[int, list[T]], Awaitable[None]],
+        *,
+        maxsize: int,
+        workers: int,
+        window: float,
+        max_items: int,
+    ) -> None:
+        self._deliver = deliver
+        self._maxsize = maxsize
+        self._worker_count = workers
+        self._window = window
+        self._max_items = max_items
+
+        # recipients that are coalescing or waiting for a worker
+        self._pending: dict[int, list[T]] = {}
+        self._ready: asyncio.Queue[int] = asyncio.Queue()
+        self._workers: list[asyncio.Task[None]] = []
+
+        self._delivered = 0
+        self._failed = 0
+        self._dropped = 0
+
+    def push(self, recipient: int, item: T) -> bool:
+        """
+        Queue an item for a recipient. Returns False if it was dropped.
+        """
+        if (items := self._pending.get(recipient)) is not None:
+            if len(items) >= self._max_items:
+                self._dropped += 1
+                return False
+            items.append(item)
+            return True
+
+        if len(self._pending) >= self._maxsize:
+            self._dropped += 1
+            return False
+
+        self._pending[recipient] = [item]
+        asyncio.get_running_loop().call_later(
+            self._window, self._ready.put_nowait, recipient
+        )
+        return True
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.ensure_future(self._work()) for _ in range(self._worker_count)
+        ]
+
+    async def stop(self) -> None:
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    def stats(self) -> dict[str, int]:
+        queued = self._ready.qsize()
+        return {
+            "queued": queued,
+            "coalescing": len(self._pending) - queued,
+            "delivered": self._delivered,
+            "failed": self._failed,
+            "dropped": self._dropped,
+        }
+
+    async def _work(self) -> None:
+        while True:
+            recipient = await self._ready.get()
+            items = self._pending.pop(recipient)
+            try:
+                await self._deliver(recipient, items)
+            except Exception:
+                self._failed += 1
+                _LOG.exception(f"Failed to deliver {len(items)} item(s).")
+            else:
+                self._delivered += 1
+            finally:
+                self._ready.task_done()
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import bisect
+import math
+import re
+from itertools import repeat
+from typing import Generic, Mapping, Sequence, TypeVar
+
+import numpy as np
+import numpy.typing as npt
+
+__all__: Sequence[str] = ("FullTextIndex", "tokenize")
+
+K = TypeVar("K")
+
+_TOKEN_REGEX = re.compile(r"\w+")
+# BM25 parameters
+_K1 = 1.2
+_B = 0.75
+# a prefix only expands to this many terms, so a one letter prefix can not
+# turn a query into a scan of the whole vocabulary.
+MAX_PREFIX_EXPANSIONS = 64
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_REGEX.findall(text.casefold())
+
+
+class FullTextIndex(Generic[K]):
+    """
+    Inverted index over short documents, ranked with BM25.
+
+    Each document is a sequence of fields, and a term found in a field counts
+    `weight` times towards its frequency in the document. The BM25 weight of
+    every term in every document is computed when the index is built, so a
+    query only sums the precomputed weights of its terms' postings.
+    """
+
+    def __init__(
+        self,
+        documents: Mapping[K, Sequence[str]],
+        weights: Sequence[float] | None = None,
+    ) -> None:
+        self._keys = list(documents)
+
+        frequencies: list[dict[str, float]] = []
+        for fields in documents.values():
+            frequency: dict[str, float] = {}
+            for field, weight in zip(fields, weights or repeat(1.0)):
+                for term in tokenize(field):
+                    frequency[term] = frequency.get(term, 0.0) + weight
+            frequencies.append(frequency)
+
+        lengths = np.array([sum(f.values()) for f in frequencies], dtype=np.float32)
+        average_length = float(lengths.mean()) if len(lengths) else 0.0
+        norms = _K1 * (1 - _B + _B * lengths / max(average_length, 1.0))
+
+        postings: dict[str, tuple[list[int], list[float]]] = {}
+        for position, frequency in enumerate(frequencies):
+            for term, count in frequency.items():
+                posting = postings.setdefault(term, ([], []))
+                posting[0].append(position)
+                posting[1].append(count)
+
+        total = len(self._keys)
+        self._postings: dict[
+            str, tuple[npt.NDArray[np.intp], npt.NDArray[np.float32]]
+        ] = {}
+        for term, (positions, counts) in postings.items():
+            positions_array = np.array(positions, dtype=np.intp)
+            counts_array = np.array(counts, dtype=np.float32)
+            idf = math.log(1 + (total - len(positions) + 0.5) / (len(positions) + 0.5))
+            self._postings[term] = (
+                positions_array,
+                (
+                    idf
+                    * counts_array
+                    * (_K1 + 1)
+                    / (counts_array + norms[positions_array])
+                ).astype(np.float32),
+            )
+        # sorted, so the terms starting with a prefix can be found by bisecting
+        self._terms = sorted(self._postings)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def key(self, position: int) -> K:
+        return self._keys[position]
+
+    def rank(
+        self, query: str, *, prefix: bool = False
+    ) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.float32]]:
+        """
+        Return the positions of the documents matching any term of the query,
+        best match first, and their scores.
+
+        If `prefix` is True and the query does not end with whitespace, its
+        last term also matches every term it is a prefix of, which is what
+        autocomplete needs while a word is still being typed.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        scores = np.zeros(len(self._keys), dtype=np.float32)
+
+        if prefix and terms and not query[-1].isspace():
+            last = terms.pop()
+            best = np.zeros_like(scores)
+            for term in self._expand(last):
+                positions, weights = self._postings[term]
+                best[positions] = np.maximum(best[positions], weights)
+            scores += best
+
+        for term in terms:
+            if (posting := self._postings.get(term)) is not None:
+                positions, weights = posting
+                scores[positions] += weights
+
+        matched = np.flatnonzero(scores)
+        order = np.argsort(-scores[matched], kind="stable")
+        return matched[order], scores[matched][order]
+
+    def search(
+        self, query: str, *, prefix: bool = False, limit: int | None = None
+    ) -> list[tuple[K, float]]:
+        positions, scores = self.rank(query, prefix=prefix)
+        return [
+            (self._keys[position], float(score))
+            for position, score in zip(positions[:limit], scores[:limit])
+        ]
+
+    def _expand(self, prefix: str) -> list[str]:
+        start = bisect.bisect_left(self._terms, prefix)
+        expanded: list[str] = []
+        for term in self._terms[start : start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            expanded.append(term)
+        return expanded
@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import itertools
+import sys
+from collections import deque
+from typing import AbstractSet, Sequence
+
+__all__: Sequence[str] = ("HighlightIndex", "HighlightMatcher")
+
+
+class HighlightMatcher:
+    """
+    Case-insensitive multi-pattern substring matcher, implemented as an
+    Aho-Corasick automaton.
+
+    Finding every pattern that occurs in a text costs one pass over the
+    casefolded text, regardless of how many patterns have been added. The
+    automaton is rebuilt lazily on the first search after it was modified.
+    """
+
+    def __init__(self) -> None:
+        # casefolded pattern -> patterns as they were added
+        self._patterns: dict[str, set[str]] = {}
+
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[frozenset[str]] = [frozenset()]
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return sum(map(len, self._patterns.values()))
+
+    def __contains__(self, pattern: object) -> bool:
+        if not isinstance(pattern, str):
+            return False
+        return pattern in self._patterns.get(pattern.casefold(), ())
+
+    def add(self, pattern: str) -> None:
+        folded = pattern.casefold()
+        if (originals := self._patterns.get(folded)) is None:
+            self._patterns[folded] = {pattern}
+            self._dirty = True
+        else:
+            originals.add(pattern)
+
+    def discard(self, pattern: str) -> None:
+        folded = pattern.casefold()
+        if (originals := self._patterns.get(folded)) is None:
+            return
+
+        originals.discard(pattern)
+        if not originals:
+            del self._patterns[folded]
+            self._dirty = True
+
+    def memory_usage(self) -> int:
+        """
+        Approximate number of bytes used by the automaton's tables.
+        """
+        return (
+            sys.getsizeof(self._patterns)
+            + sum(map(sys.getsizeof, self._patterns.values()))
+            + sys.getsizeof(self._goto)
+            + sum(map(sys.getsizeof, self._goto))
+            + sys.getsizeof(self._fail)
+            + sys.getsizeof(self._out)
+            + sum(sys.getsizeof(out) for out in set(self._out))
+        )
+
+    def find(self, text: str) -> set[str]:
+        """
+        Return every added pattern that occurs in `text`, ignoring case.
+        """
+        return self.find_folded(text.casefold())
+
+    def find_folded(self, folded: str) -> set[str]:
+        """
+        Same as `find`, for text that has already been casefolded.
+        """
+        if self._dirty:
+            self._build()
+
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+
+        found: set[str] = set()
+        state = 0
+        for char in folded:
+            while char not in goto[state] and state:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+
+        return {pattern for folded in found for pattern in self._patterns[folded]}
+
+    def _build(self) -> None:
+        goto: list[dict[str, int]] = [{}]
+        ends: dict[int, str] = {}
+        for folded in self._patterns:
+            state = 0
+            for char in folded:
+                if (next_state := goto[state].get(char)) is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                state = next_state
+            ends[state] = folded
+
+        fail = [0] * len(goto)
+        out: list[frozenset[str]] = [frozenset()] * len(goto)
+        if 0 in ends:
+            out[0] = frozenset((ends[0],))
+
+        # breadth-first, so that the failure state of every node (which is
+        # always shallower than the node itself) is finished first.
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            out[state] = out[fail[state]]
+            if state in ends:
+                out[state] = out[state] | {ends[state]}
+
+            for char, child in goto[state].items():
+                fallback = fail[state]
+                while char not in goto[fallback] and fallback:
+                    fallback = fail[fallback]
+                fail[child] = goto[fallback].get(char, 0)
+                queue.append(child)
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+        self._dirty = False
+
+
+class HighlightIndex:
+    """
+    In-memory index of highlights and the users subscribed to them, in both
+    directions.
+
+    User IDs are stored as plain ints and highlight strings are interned, so
+    the same objects are shared between both directions of the index.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: dict[str, set[int]] = {}
+        self._user_highlights: dict[int, set[str]] = {}
+        self._matcher = HighlightMatcher()
+
+        # small integer IDs for highlights, used as cooldown keys
+        self._ids: dict[str, int] = {}
+        self._next_id = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def add(self, highlight: str, user_id: int) -> bool:
+        """
+        Subscribe a user to a highlight. Returns False if they already were.
+        """
+        user_id = int(user_id)
+        if (subscribers := self._subscribers.get(highlight)) is None:
+            highlight = sys.intern(highlight)
+            subscribers = self._subscribers[highlight] = set()
+            self._ids[highlight] = next(self._next_id)
+            self._matcher.add(highlight)
+        elif user_id in subscribers:
+            return False
+
+        subscribers.add(user_id)
+        self._user_highlights.setdefault(user_id, set()).add(sys.intern(highlight))
+        return True
+
+    def remove(self, highlight: str, user_id: int) -> bool:
+        """
+        Unsubscribe a user from a highlight. Returns False if they were not
+        subscribed.
+        """
+        user_id = int(user_id)
+        subscribers = self._subscribers.get(highlight)
+        if subscribers is None or user_id not in subscribers:
+            return False
+
+        subscribers.remove(user_id)
+        if not subscribers:
+            del self._subscribers[highlight]
+            del self._ids[highlight]
+            self._matcher.discard(highlight)
+
+        user_highlights = self._user_highlights[user_id]
+        user_highlights.remove(highlight)
+        if not user_highlights:
+            del self._user_highlights[user_id]
+
+        return True
+
+    def id_of(self, highlight: str) -> int:
+        """
+        Return an ID for a highlight that is unique while it has subscribers.
+        """
+        return self._ids[highlight]
+
+    def subscribers(self, highlight: str) -> AbstractSet[int]:
+        return self._subscribers.get(highlight, frozenset())
+
+    def user_highlights(self, user_id: int) -> AbstractSet[str]:
+        return self._user_highlights.get(int(user_id), frozenset())
+
+    def count(self, user_id: int) -> int:
+        return len(self.user_highlights(user_id))
+
+    def find_folded(self, folded: str) -> dict[str, AbstractSet[int]]:
+        """
+        Return every highlight that occurs in the casefolded text `folded`,
+        mapped to the users subscribed to it.
+        """
+        return {
+            highlight: self._subscribers[highlight]
+            for highlight in self._matcher.find_folded(folded)
+        }
+
+    def memory_usage(self) -> int:
+        """
+        Approximate number of bytes used by the index, including the matcher.
+        Objects shared between both directions of the index are only counted
+        once.
+        """
+        seen: set[int] = set()
+        total = self._matcher.memory_usage()
+
+        def count(obj: object) -> None:
+            nonlocal total
+            if id(obj) not in seen:
+                seen.add(id(obj))
+                total += sys.getsizeof(obj)
+
+        count(self._subscribers)
+        count(self._user_highlights)
+        count(self._ids)
+        for highlight, subscribers in self._subscribers.items():
+            count(highlight)
+            count(subscribers)
+            for user_id in subscribers:
+                count(user_id)
+        for user_id, highlights in self._user_highlights.items():
+            count(user_id)
+            count(highlights)
+
+        return total
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "highlights": len(self._subscribers),
+            "users": len(self._user_highlights),
+            "subscriptions": sum(map(len, self._subscribers.values())),
+            "memory_bytes": self.memory_usage(),
+        }
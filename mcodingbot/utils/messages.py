@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from functools import cached_property
+from typing import Sequence
+
+import hikari
+from cachetools import LRUCache
+
+__all__: Sequence[str] = ("MessageAnalysis", "analyze_message")
+
+
+class MessageAnalysis:
+    """
+    Content of a message, prepared once and shared by every plugin that
+    scans it.
+    """
+
+    def __init__(self, content: str) -> None:
+        self.content = content
+
+    @cached_property
+    def folded(self) -> str:
+        return self.content.casefold()
+
+    def mentions(self, word: str) -> bool:
+        """
+        Cheap, case-insensitive prefilter. `word` must already be casefolded.
+        """
+        return word in self.folded
+
+
+_analyses: LRUCache[int, MessageAnalysis] = LRUCache(maxsize=1_000)
+
+
+def analyze_message(message: hikari.PartialMessage) -> MessageAnalysis | None:
+    """
+    Return the analysis of a message's content, or None if it has no content.
+    Every event handler for the same message shares the same analysis.
+    """
+    content = message.content
+    if not content:
+        return None
+
+    analysis = _analyses.get(message.id)
+    if analysis is None or analysis.content != content:
+        analysis = _analyses[message.id] = MessageAnalysis(content)
+    return analysis
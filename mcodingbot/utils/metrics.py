@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Mapping, Sequence
+
+__all__: Sequence[str] = (
+    "HitCounter",
+    "MetricsSource",
+    "register_metrics",
+    "collect_metrics",
+)
+
+MetricsSource = Callable[[], Mapping[str, object]]
+
+_SOURCES: dict[str, MetricsSource] = {}
+
+
+def register_metrics(name: str, source: MetricsSource) -> None:
+    """
+    Register a callable that reports the current metrics for a component.
+    Registering a name again replaces the previous source.
+    """
+    _SOURCES[name] = source
+
+
+def collect_metrics() -> dict[str, Mapping[str, object]]:
+    return {name: source() for name, source in _SOURCES.items()}
+
+
+@dataclass
+class HitCounter:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self, prefix: str = "") -> dict[str, int | float]:
+        return {
+            f"{prefix}hits": self.hits,
+            f"{prefix}misses": self.misses,
+            f"{prefix}hit_rate": round(self.hit_rate, 3),
+        }
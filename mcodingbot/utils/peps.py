@@ -1,15 +1,24 @@
 from __future__ import annotations
 
-import itertools
+import asyncio
+import bisect
+import hashlib
+import json
+import os
 from dataclasses import dataclass
 from logging import getLogger
-from typing import TYPE_CHECKING, Iterable, Iterator, Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator, Sequence
 
-import aiohttp
 import hikari
+import numpy as np
+import numpy.typing as npt
+from cachetools import LRUCache
 
 from mcodingbot.config import CONFIG
-from mcodingbot.utils.search import fuzzy_search
+from mcodingbot.utils.fulltext import FullTextIndex
+from mcodingbot.utils.metrics import HitCounter
+from mcodingbot.utils.search import FuzzyIndex
 
 if TYPE_CHECKING:
     from mcodingbot.model import Model
@@ -18,71 +27,222 @@ _LOG = getLogger(__name__)
 
 __all__: Sequence[str] = ("PEPManager", "PEPInfo")
 
+PEPS_URL = "https://peps.python.org/api/peps.json"
+SEARCH_CACHE_SIZE = 1_024
+# how much a term counts in each field of a PEP for full-text search
+FULL_TEXT_WEIGHTS = {"title": 2.0, "authors": 1.0, "status": 0.5, "type": 0.5}
+
 
 class PEPManager:
-    def __init__(self) -> None:
-        self._peps: dict[int, PEPInfo] = {}
-        self._pep_map: dict[int, str] = {}
+    def __init__(self, snapshot_path: Path | str | None = None) -> None:
+        self._index = _PEPIndex({})
+        self._digest: str | None = None
+        self._etag: str | None = None
+        self._last_modified: str | None = None
 
-    async def fetch_pep_info(self, model: Model) -> None:
-        async with model.session.get("https://peps.python.org/api/peps.json") as resp:
-            try:
-                resp.raise_for_status()
-            except aiohttp.ClientResponseError:
-                _LOG.exception("Could not fetch peps.")
-            else:
-                self._peps = {
-                    int(pep_id): PEPInfo(
-                        number=int(pep_id),
-                        title=pep["title"],
-                        authors=pep["authors"],
-                        link=pep["url"],
-                    )
-                    for pep_id, pep in (await resp.json()).items()
-                }
-                self._pep_map = {
-                    k: f"{v.title} ({v.number})" for k, v in self._peps.items()
-                }
+        self._search_counter = HitCounter()
 
-    def get(self, pep_number: int) -> PEPInfo | None:
-        return self._peps.get(pep_number)
+        self._snapshot_path = Path(snapshot_path) if snapshot_path else None
+        if self._snapshot_path:
+            self._load_snapshot(self._snapshot_path)
 
-    def _get_matches_digits(
-        self, query: str, limit: int | None
-    ) -> tuple[list[PEPInfo], int]:
+    async def fetch_pep_info(self, model: Model) -> None:
         """
-        Returns a tuple of (Items found, Amount of items found).
+        Refresh the PEP index. Uses a conditional request, so unchanged data
+        costs a single 304, and only swaps the index if the data changed.
         """
-        items_iter = (
-            value for key, value in self._peps.items() if str(key).startswith(query)
-        )
-        items = list(itertools.islice(items_iter, limit))
-        return items, len(items)
+        headers: dict[str, str] = {}
+        if self._etag:
+            headers["If-None-Match"] = self._etag
+        if self._last_modified:
+            headers["If-Modified-Since"] = self._last_modified
 
-    def search(self, query: str, *, limit: int | None = None) -> Iterator[PEPInfo]:
-        yielded = 0
+        async with model.session.get(PEPS_URL, headers=headers) as resp:
+            if resp.status == 304:
+                _LOG.debug("PEPs have not changed.")
+                return
+            if not resp.ok:
+                _LOG.error(f"Could not fetch peps: {resp.status} {resp.reason}")
+                return
+
+            body = await resp.read()
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
 
-        items: Iterable[PEPInfo] = ()
-        if query.isdigit():
-            items, yielded = self._get_matches_digits(query, limit)
-            yield from items
+        digest = hashlib.sha256(body).hexdigest()
+        if digest != self._digest:
+            raw_peps: dict[str, Any] = json.loads(body)
+            self._index = _PEPIndex(raw_peps)
+            self._digest = digest
+        self._etag = etag
+        self._last_modified = last_modified
 
-        if limit and yielded >= limit:
+        if self._snapshot_path:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._save_snapshot, self._snapshot_path, body
+            )
+
+    def _load_snapshot(self, path: Path) -> None:
+        try:
+            with path.open("r") as f:
+                snapshot: dict[str, Any] = json.load(f)
+            index = _PEPIndex(snapshot["peps"])
+        except FileNotFoundError:
+            return
+        except (ValueError, KeyError, TypeError):
+            _LOG.exception(f"Ignoring invalid PEP snapshot at {path}.")
             return
 
-        res = fuzzy_search(query, self._pep_map, limit=limit)
+        self._index = index
+        self._digest = snapshot.get("digest")
+        self._etag = snapshot.get("etag")
+        self._last_modified = snapshot.get("last_modified")
 
-        for pep in res:
-            pep_info = self.get(pep[2])
-            if not pep_info or pep_info in items:
+    def _save_snapshot(self, path: Path, body: bytes) -> None:
+        snapshot = {
+            "digest": self._digest,
+            "etag": self._etag,
+            "last_modified": self._last_modified,
+            "peps": json.loads(body),
+        }
+        tmp = path.with_name(f"{path.name}.tmp")
+        with tmp.open("w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, path)
+
+    def get(self, pep_number: int) -> PEPInfo | None:
+        return self._index.peps.get(pep_number)
+
+    def search(self, query: str, *, limit: int | None = None) -> Iterator[PEPInfo]:
+        index = self._index
+        seen: set[int] = set()
+
+        if query.isascii() and query.isdigit():
+            for pep_info in index.with_number_prefix(query, limit):
+                seen.add(pep_info.number)
+                yield pep_info
+
+        if limit and len(seen) >= limit:
+            return
+
+        for position in self._fuzzy_matches(index, query):
+            number = index.fuzzy.key(position)
+            if number in seen:
                 continue
 
-            yield pep_info
-            yielded += 1
+            seen.add(number)
+            yield index.peps[number]
 
-            if limit and yielded >= limit:
+            if limit and len(seen) >= limit:
                 return
 
+    def full_text_search(
+        self, query: str, *, limit: int | None = None
+    ) -> list[PEPInfo]:
+        """
+        Search the titles, authors, status and type of every PEP, best match
+        first.
+        """
+        index = self._index
+        return [
+            index.peps[number]
+            for number, _ in index.full_text.search(query, limit=limit)
+        ]
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "search_cache_size": len(self._index.search_cache),
+            **self._search_counter.stats("search_"),
+        }
+
+    def _fuzzy_matches(self, index: _PEPIndex, query: str) -> npt.NDArray[np.intp]:
+        """
+        Return the positions of every choice, best match for a query first.
+
+        Results are cached per query, since autocomplete often sends the same
+        query again, e.g. when the user deletes a character.
+        """
+        key = query.casefold()
+        if (cached := index.search_cache.get(key)) is not None:
+            self._search_counter.hits += 1
+            return cached
+        self._search_counter.misses += 1
+
+        positions, _ = index.fuzzy.rank(query)
+        index.search_cache[key] = positions
+        return positions
+
+
+class _PEPIndex:
+    """
+    PEP data and everything derived from it. A new index is built for every
+    change and swapped in as a whole, so readers never see a mix of old and
+    new data.
+    """
+
+    def __init__(self, raw_peps: dict[str, Any]) -> None:
+        self.peps = {
+            int(pep_id): PEPInfo(
+                number=int(pep_id),
+                title=pep["title"],
+                authors=pep["authors"],
+                link=pep["url"],
+                status=pep["status"],
+                type=pep["type"],
+            )
+            for pep_id, pep in raw_peps.items()
+        }
+        self.pep_map = {k: f"{v.title} ({v.number})" for k, v in self.peps.items()}
+        self.numbers = sorted(self.peps)
+        self.fuzzy = FuzzyIndex(self.pep_map)
+        self.full_text = FullTextIndex(
+            {
+                number: [getattr(pep, field) for field in FULL_TEXT_WEIGHTS]
+                for number, pep in self.peps.items()
+            },
+            weights=list(FULL_TEXT_WEIGHTS.values()),
+        )
+        # casefolded query -> positions of every choice, best match first.
+        # Lives on the index, so it is dropped together with the data it was
+        # built from.
+        self.search_cache: LRUCache[str, npt.NDArray[np.intp]] = LRUCache(
+            maxsize=SEARCH_CACHE_SIZE
+        )
+
+    def with_number_prefix(self, prefix: str, limit: int | None) -> list[PEPInfo]:
+        """
+        Return the PEPs whose number starts with the digits `prefix`, in
+        numerical order.
+
+        The numbers starting with `prefix` form one contiguous range of
+        `self.numbers` per digit count, so each range is found with a binary
+        search.
+        """
+        if prefix.startswith("0"):
+            # no PEP number has a leading zero, except for PEP 0 itself
+            pep = self.peps.get(0) if prefix == "0" else None
+            return [pep] if pep else []
+
+        numbers = self.numbers
+        if not numbers:
+            return []
+
+        found: list[PEPInfo] = []
+        low = int(prefix)
+        high = low + 1
+        while low <= numbers[-1]:
+            start = bisect.bisect_left(numbers, low)
+            stop = bisect.bisect_left(numbers, high, lo=start)
+            for number in numbers[start:stop]:
+                found.append(self.peps[number])
+                if limit and len(found) >= limit:
+                    return found
+
+            low *= 10
+            high *= 10
+
+        return found
+
 
 @dataclass
 class PEPInfo:
@@ -90,6 +250,8 @@ class PEPInfo:
     title: str
     authors: str
     link: str
+    status: str
+    type: str
 
     def embed(self) -> hikari.Embed:
         return hikari.Embed(
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-from typing import Mapping, TypeVar
+from typing import Generic, Mapping, Sequence, TypeVar, cast
 
-from rapidfuzz import fuzz, process
+import numpy as np
+import numpy.typing as npt
+from rapidfuzz import fuzz, process, utils
 
 K = TypeVar("K")
 V = TypeVar("V")
@@ -22,3 +24,84 @@ def fuzzy_search(
         score_cutoff=score_cutoff,
         limit=limit,
     )
+
+
+def _process(text: str) -> str:
+    return cast(str, utils.default_process(text.casefold()))
+
+
+class FuzzyIndex(Generic[K]):
+    """
+    A set of choices that can be fuzzy searched repeatedly. Choices are
+    preprocessed once when the index is created, and scoring runs through
+    rapidfuzz's batch API, so many queries can be scored in one call.
+    """
+
+    def __init__(self, choices: Mapping[K, str]) -> None:
+        self._keys = list(choices)
+        self._choices = list(choices.values())
+        self._processed = [_process(choice) for choice in self._choices]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def key(self, position: int) -> K:
+        return self._keys[position]
+
+    def scores(
+        self, queries: Sequence[str], candidates: npt.NDArray[np.intp] | None = None
+    ) -> npt.NDArray[np.float32]:
+        """
+        Score every query against every choice (or only against the choices
+        at the positions in `candidates`). Returns an array with one row per
+        query and one column per choice.
+        """
+        choices = self._processed
+        if candidates is not None:
+            choices = [choices[i] for i in candidates]
+
+        if not queries or not choices:
+            return np.zeros((len(queries), len(choices)), dtype=np.float32)
+
+        return process.cdist(
+            [_process(query) for query in queries],
+            choices,
+            scorer=fuzz.WRatio,
+            processor=None,
+        )
+
+    def rank(
+        self,
+        query: str,
+        *,
+        candidates: npt.NDArray[np.intp] | None = None,
+        score_cutoff: float | None = None,
+    ) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.float32]]:
+        """
+        Return the positions of the matching choices, best match first, and
+        their scores.
+        """
+        scores = self.scores([query], candidates)[0]
+        positions = (
+            np.arange(len(scores), dtype=np.intp) if candidates is None else candidates
+        )
+
+        if score_cutoff is not None:
+            keep = scores >= score_cutoff
+            scores = scores[keep]
+            positions = positions[keep]
+
+        order = np.argsort(-scores, kind="stable")
+        return positions[order], scores[order]
+
+    def extract(
+        self, query: str, *, score_cutoff: float | None = None, limit: int | None = None
+    ) -> list[tuple[str, float, K]]:
+        """
+        Same as `fuzzy_search`, without reprocessing the choices.
+        """
+        positions, scores = self.rank(query, score_cutoff=score_cutoff)
+        return [
+            (self._choices[position], float(score), self._keys[position])
+            for position, score in zip(positions[:limit], scores[:limit])
+        ]
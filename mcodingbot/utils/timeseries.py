@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+from array import array
+from datetime import timedelta
+from typing import Iterable, Sequence
+
+__all__: Sequence[str] = ("RingSeries", "TieredSeries")
+
+
+class RingSeries:
+    """
+    Fixed-size ring of timestamped samples with `width` integer values each,
+    stored in flat arrays.
+
+    Time is divided into buckets of `resolution`, and the ring keeps the last
+    sample of each bucket: a sample in the same bucket as the newest one
+    replaces it. Once the ring is full, the oldest bucket is overwritten.
+    """
+
+    def __init__(self, resolution: timedelta, capacity: int, width: int) -> None:
+        self.resolution = int(resolution.total_seconds())
+        self._capacity = capacity
+        # start of each bucket, in seconds since the epoch
+        self._buckets = array("q", [0]) * capacity
+        self._columns = [array("q", [0]) * capacity for _ in range(width)]
+        self._start = 0
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def bucket(self, index: int) -> int:
+        return self._buckets[self._physical(index)]
+
+    def values(self, index: int) -> tuple[int, ...]:
+        position = self._physical(index)
+        return tuple(column[position] for column in self._columns)
+
+    def add(self, timestamp: float, values: Sequence[int]) -> int | None:
+        """
+        Add a sample. Returns the start of the bucket it was stored in, or
+        None if it is older than the newest bucket and was ignored.
+        """
+        bucket = int(timestamp) // self.resolution * self.resolution
+
+        if self._len and (newest := self.bucket(-1)) >= bucket:
+            if newest > bucket:
+                return None
+            position = self._physical(-1)
+        elif self._len < self._capacity:
+            position = self._physical(self._len)
+            self._len += 1
+        else:
+            position = self._start
+            self._start = (self._start + 1) % self._capacity
+
+        self._buckets[position] = bucket
+        for column, value in zip(self._columns, values):
+            column[position] = value
+        return bucket
+
+    def at_or_before(self, timestamp: float) -> int | None:
+        """
+        Return the index of the newest bucket starting at or before
+        `timestamp`, or None if every bucket starts after it.
+        """
+        low, high = 0, self._len
+        while low < high:
+            middle = (low + high) // 2
+            if self.bucket(middle) <= timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low - 1 if low else None
+
+    def _physical(self, index: int) -> int:
+        if index < 0:
+            index += self._len
+        return (self._start + index) % self._capacity
+
+
+class TieredSeries:
+    """
+    The same samples kept at several resolutions, finest first, so recent
+    history is detailed while older history is downsampled and still cheap to
+    keep.
+
+    Buckets that changed since the last call to `drain_changes` are tracked,
+    so they can be persisted in batches.
+    """
+
+    def __init__(
+        self, tiers: Sequence[tuple[timedelta, timedelta]], width: int
+    ) -> None:
+        """
+        `tiers` are (resolution, retention) pairs, finest resolution first.
+        """
+        self.tiers = [
+            RingSeries(resolution, int(retention / resolution) + 1, width)
+            for resolution, retention in tiers
+        ]
+        self._retentions = {
+            tier.resolution: int(retention.total_seconds())
+            for tier, (_, retention) in zip(self.tiers, tiers)
+        }
+        # (resolution, bucket) -> values
+        self._changes: dict[tuple[int, int], tuple[int, ...]] = {}
+
+    def add(self, timestamp: float, values: Sequence[int]) -> None:
+        for tier in self.tiers:
+            if (bucket := tier.add(timestamp, values)) is not None:
+                self._changes[tier.resolution, bucket] = tuple(values)
+
+    def load(
+        self, resolution: int, samples: Iterable[tuple[int, Sequence[int]]]
+    ) -> None:
+        """
+        Load persisted (bucket, values) samples into the tier with the given
+        resolution, oldest first, without marking them as changed.
+        """
+        for tier in self.tiers:
+            if tier.resolution == resolution:
+                for bucket, values in samples:
+                    tier.add(bucket, values)
+
+    def latest(self) -> tuple[int, tuple[int, ...]] | None:
+        finest = self.tiers[0]
+        if not finest:
+            return None
+        return finest.bucket(-1), finest.values(-1)
+
+    def delta(self, period: timedelta) -> tuple[int, ...] | None:
+        """
+        Return how much each value changed over `period` before the latest
+        sample, using the finest tier that reaches back that far, or None if
+        no tier does.
+        """
+        if (latest := self.latest()) is None:
+            return None
+
+        newest, values = latest
+        target = newest - period.total_seconds()
+        for tier in self.tiers:
+            if tier and tier.bucket(0) <= target:
+                index = tier.at_or_before(target)
+                assert index is not None
+                past = tier.values(index)
+                return tuple(now - then for now, then in zip(values, past))
+        return None
+
+    def retention_cutoffs(self, now: float) -> dict[int, int]:
+        """
+        Return the oldest bucket each tier keeps, by resolution.
+        """
+        return {
+            resolution: int(now) - retention
+            for resolution, retention in self._retentions.items()
+        }
+
+    def drain_changes(self) -> list[tuple[int, int, tuple[int, ...]]]:
+        """
+        Return the (resolution, bucket, values) of every bucket that changed
+        since the last call, and forget them.
+        """
+        changes, self._changes = self._changes, {}
+        return [
+            (resolution, bucket, values)
+            for (resolution, bucket), values in changes.items()
+        ]
+
+    def requeue_changes(
+        self, changes: Iterable[tuple[int, int, tuple[int, ...]]]
+    ) -> None:
+        """
+        Mark changes that could not be persisted as changed again, unless the
+        bucket changed again since.
+        """
+        for resolution, bucket, values in changes:
+            self._changes.setdefault((resolution, bucket), values)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from datetime import date, datetime, timedelta, timezone
+from logging import getLogger
+from typing import TYPE_CHECKING, Any, NamedTuple, Sequence
+
+import aiohttp
+
+if TYPE_CHECKING:
+    from mcodingbot.model import Model
+
+__all__: Sequence[str] = ("ChannelStatistics", "YouTubeStats")
+
+_LOG = getLogger(__name__)
+
+CHANNELS_URL = "https://www.googleapis.com/youtube/v3/channels"
+# quota units used by a channels.list request
+CHANNELS_LIST_COST = 1
+# the daily quota is reset at midnight Pacific time. A fixed offset means the
+# count is reset an hour late during daylight saving time, never early.
+QUOTA_TIMEZONE = timezone(timedelta(hours=-8))
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(hours=1)
+# caps the exponent, so a long outage can not overflow the delay
+MAX_BACKOFF_DOUBLINGS = 16
+
+
+class ChannelStatistics(NamedTuple):
+    subscribers: int
+    views: int
+
+
+class YouTubeStats:
+    """
+    Fetches the statistics of a YouTube channel.
+
+    The last good response is served until it is older than `ttl`. Quota
+    units are counted per day and no request is made once `daily_quota` is
+    used up. Rate limits, quota errors and server errors back off
+    exponentially, with jitter, until a request succeeds again.
+    """
+
+    def __init__(
+        self, channel_id: str, api_key: str, *, ttl: timedelta, daily_quota: int
+    ) -> None:
+        self._channel_id = channel_id
+        self._api_key = api_key
+        self._ttl = ttl.total_seconds()
+        self._daily_quota = daily_quota
+
+        self._cached: ChannelStatistics | None = None
+        self._fetched_at = 0.0
+
+        self._quota_day = date.min
+        self._quota_used = 0
+
+        self._retry_at = 0.0
+        self._consecutive_failures = 0
+
+        self._requests = 0
+        self._failures = 0
+        self._cache_hits = 0
+        self._last_latency = 0.0
+
+    async def fetch(self, model: Model) -> ChannelStatistics | None:
+        """
+        Return the channel's statistics, or the last good statistics (None if
+        there are none) if they can not be fetched right now.
+        """
+        now = time.monotonic()
+        if self._cached and now - self._fetched_at < self._ttl:
+            self._cache_hits += 1
+            return self._cached
+
+        if now < self._retry_at:
+            return self._cached
+
+        if not self._use_quota(CHANNELS_LIST_COST):
+            _LOG.warning("YouTube API quota is used up for today.")
+            return self._cached
+
+        params = {"part": "statistics", "id": self._channel_id, "key": self._api_key}
+        self._requests += 1
+        try:
+            async with model.session.get(CHANNELS_URL, params=params) as resp:
+                self._last_latency = time.monotonic() - now
+                if not resp.ok:
+                    # mostly 403 (quota), 429 (rate limit) and 5xx
+                    self._back_off(resp.headers.get("Retry-After"))
+                    _LOG.error(
+                        f"YouTube API returned {resp.status} {resp.reason}, retrying"
+                        f" in {self._retry_at - time.monotonic():.0f}s."
+                    )
+                    return self._cached
+
+                response: dict[str, Any] = await resp.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self._back_off(None)
+            _LOG.exception("Could not fetch YouTube statistics.")
+            return self._cached
+
+        if (statistics := self._parse(response)) is None:
+            self._failures += 1
+            return self._cached
+
+        self._consecutive_failures = 0
+        self._cached = statistics
+        self._fetched_at = time.monotonic()
+        return statistics
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "requests": self._requests,
+            "failures": self._failures,
+            "cache_hits": self._cache_hits,
+            "quota_used_today": self._quota_used,
+            "last_latency_ms": round(self._last_latency * 1_000, 1),
+            "backoff_remaining_s": round(max(self._retry_at - time.monotonic(), 0), 1),
+        }
+
+    def _use_quota(self, units: int) -> bool:
+        today = datetime.now(QUOTA_TIMEZONE).date()
+        if today != self._quota_day:
+            self._quota_day = today
+            self._quota_used = 0
+
+        if self._quota_used + units > self._daily_quota:
+            return False
+        self._quota_used += units
+        return True
+
+    def _back_off(self, retry_after: str | None) -> None:
+        self._failures += 1
+        self._consecutive_failures += 1
+
+        doublings = min(self._consecutive_failures - 1, MAX_BACKOFF_DOUBLINGS)
+        delay = min(
+            BACKOFF_BASE.total_seconds() * 2**doublings, BACKOFF_MAX.total_seconds()
+        )
+        # jitter, so retries are spread out instead of synchronised
+        delay *= random.uniform(0.5, 1)
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, int(retry_after))
+
+        self._retry_at = time.monotonic() + delay
+
+    def _parse(self, response: dict[str, Any]) -> ChannelStatistics | None:
+        if not response:
+            _LOG.error("Received 2XX but no data.")
+            return None
+
+        items = response.get("items")
+        if not items:
+            _LOG.error("Response did not contain 'items'.")
+            return None
+
+        channel = items[0]
+        if channel.get("id") != self._channel_id:
+            _LOG.error("Channel ID was not the requested channel.")
+            return None
+
+        statistics = channel.get("statistics")
+        if not statistics:
+            _LOG.error("Channel did not contain 'statistics'.")
+            return None
+
+        subs = int(statistics.get("subscriberCount", 0))
+        views = int(statistics.get("viewCount", 0))
+
+        if not (subs and views):
+            _LOG.error("Statistics did not contain subscriberCount and viewCount.")
+            return None
+
+        return ChannelStatistics(subs, views)